@@ -1,70 +1,49 @@
+import time
+_import_started = time.perf_counter()
+
 import logging
 import pyodbc
 from azure.functions import TimerRequest
-from datetime import datetime, timezone
 import pandas as pd
 import numpy as np
 import json
-import joblib
-from sklearn.preprocessing import LabelEncoder, StandardScaler
 import os
+import threading
 from dotenv import load_dotenv
+from shared_code.alignmentPlan import scale_features
+from shared_code.baseModelPool import run_base_models
+from shared_code.batchSizer import AdaptiveBatchSizer
+from shared_code.bulkWriteBack import write_back
+from shared_code.churnPreprocessing import preprocess_for_inference
+from shared_code.columnProjection import ColumnProjection
+from shared_code.forestArrays import forest_predict
+from shared_code.modelRegistry import get_churn_registry
+from shared_code.stageTimer import stage, timed_run
+from shared_code.workQueue import WorkQueue
 load_dotenv()
 
 # === Load models and encoders ===
-try:
-    gbr_model = joblib.load("Models/ChurnModels/gbr_model.pkl")
-    print("[Churn] GBR model loaded successfully.")
-    logging.info("[Churn] GBR model loaded successfully.")
-except Exception as e: 
-    print(f"[Churn] Failed to load GBR model: {e}")
-    logging.error(f"[Churn] Failed to load GBR model: {e}")
-    raise
-
-try:
-    rf_model = joblib.load("Models/ChurnModels/rf_model.pkl")
-    print("[Churn] Random Forest model loaded successfully.")
-    logging.info("[Churn] Random Forest model loaded successfully.")
-except Exception as e:
-    print(f"[Churn] Failed to load Random Forest model: {e}")
-    logging.error(f"[Churn] Failed to load Random Forest model: {e}")
-    raise
-
-try:
-    meta_model = joblib.load("Models/ChurnModels/meta_model.pkl")
-    print("[Churn] Meta model loaded successfully.")
-    logging.info("[Churn] Meta model loaded successfully.")
-except Exception as e:
-    print(f"[Churn] Failed to load Meta model: {e}")
-    logging.error(f"[Churn] Failed to load Meta model: {e}")
-    raise
-
-try:
-    label_encoders = joblib.load("Models/ChurnModels/label_encoders.pkl")
-    print("[Churn] Label Encoders loaded successfully.")
-    logging.info("[Churn] Label Encoders loaded successfully.")
-except Exception as e:
-    print(f"[Churn] Failed to load Label Encoders: {e}")
-    logging.error(f"[Churn] Failed to load Label Encoders: {e}")
-    raise
-
-try:
-    scaler = joblib.load("Models/ChurnModels/scaler.pkl")
-    print("[Churn] Scaler loaded successfully.")
-    logging.info("[Churn] Scaler loaded successfully.")
-except Exception as e:
-    print(f"[Churn] Failed to load Scaler: {e}")
-    logging.error(f"[Churn] Failed to load Scaler: {e}")
-    raise
-
-try:
-    column_names = np.load("Models/ChurnModels/X_train_columns.npy", allow_pickle=True)
-    print("[Churn] Column names loaded successfully.")
-    logging.info("[Churn] Column names loaded successfully.")
-except Exception as e:
-    print(f"[Churn] Failed to load Column Names: {e}")
-    logging.error(f"[Churn] Failed to load Column Names: {e}")
-    raise
+# Loaded on first use, on parallel threads, by the churn registry (see modelRegistry.py), so a broken or
+# slow artifact no longer blocks or kills the worker at import. The tree models are memory-mapped from
+# Models/ChurnModels/packed with MODEL_MMAP=1, at the price of the slower NumPy evaluator (see modelPackage.py)
+churn_registry = get_churn_registry("Models/ChurnModels")
+
+# Score one made-up customer on a background thread at import, so the first timer tick finds the models
+# loaded and warm (CHURN_WARMUP=1)
+WARMUP_ENABLED = os.getenv("CHURN_WARMUP", "0") == "1"
+
+# Cold-start figures, logged once as "[Churn] cold start {...}"
+cold_start = {"import_ms": None, "load_ms": None, "first_prediction_ms": None, "warmup": WARMUP_ENABLED}
+_first_prediction_lock = threading.Lock()
+
+
+def current_models():
+    if cold_start["load_ms"] is not None:
+        return churn_registry.current()
+    start = time.perf_counter()
+    artifacts = churn_registry.current()
+    cold_start["load_ms"] = (time.perf_counter() - start) * 1000.0
+    return artifacts
 
 
 def ConnectionString():
@@ -77,155 +56,189 @@ def ConnectionString():
     connection_string = f"Driver={driver};Server={SQL_SERVER};Database={SQL_DATABASE};Uid={SQL_USER};Pwd={SQL_PASSWORD};Encrypt=yes;TrustServerCertificate=no;Connection Timeout=30;"
     return connection_string
 
-def preprocess_for_inference(df):
-    drop_cols = [
-        'customer_id', 'count', 'zip_code', 'lat_long', 'surname', 'rownumber',
-        'state', 'city', 'latitude', 'longitude', 'churn_reason', 'churn_score',
-        'churn_value', 'geography'
-    ]
-    df = df.drop(columns=[col for col in drop_cols if col in df.columns], errors='ignore')
-
-    if 'churn' in df.columns:
-        df['churn'] = df['churn'].astype(str).str.lower().map({
-            'yes': 1, 'no': 0, 'true': 1, 'false': 0, '1': 1, '0': 0
-        }).fillna(0).astype(int)
-
-    binary_categoricals = [
-        'gender', 'senior_citizen', 'partner', 'dependents', 'phone_service', 
-        'paperless_billing', 'complain', 'maritalstatus'
-    ]
-    le = LabelEncoder()
-    for col in binary_categoricals:
-        if col in df.columns:
-            df[col] = df[col].fillna('No')
-            df[col] = le.fit_transform(df[col].astype(str))
-
-    multi_cat_cols = [
-        'internet_service', 'online_security', 'online_backup', 'device_protection',
-        'tech_support', 'streaming_tv', 'streaming_movies', 'payment_method', 
-        'contract', 'preferredlogindevice', 'preferedordercat', 'preferredpaymentmode'
-    ]
-    for col in multi_cat_cols:
-        if col in df.columns:
-            df[col] = df[col].fillna('Unknown')
-
-    df = pd.get_dummies(df, columns=[col for col in multi_cat_cols if col in df.columns])
-
-    for col in df.select_dtypes(include='object').columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    df.fillna(df.median(numeric_only=True), inplace=True)
-
-    num_cols = df.select_dtypes(include=np.number).columns.tolist()
-    num_cols = [col for col in num_cols if col != 'churn']
-    scaler = StandardScaler()
-    df[num_cols] = scaler.fit_transform(df[num_cols])
-
-    return df
+def _timed(name, predict, *args):
+    with stage(name):
+        return predict(*args)
 
 def ChurnPredictionsModels(df):
-   
-    preprocessed_data = preprocess_for_inference(df)
+    models = current_models()
 
-    # === Drop extra columns and ensure correct order ===
-    preprocessed_data = preprocessed_data.reindex(columns=column_names, fill_value=0)
+    # The multi-category columns skip the preprocessing and are one-hot encoded straight into the training layout
+    categorical_columns = models.one_hot.categorical_columns(df)
+    categoricals = df[categorical_columns]
+    df = df.drop(columns=categorical_columns)
 
-    # === Encode any remaining label-encoded fields ===
-    for col, le in label_encoders.items():
-        if col in preprocessed_data.columns:
-            preprocessed_data[col] = le.transform(preprocessed_data[col].astype(str))
+    if models.preprocessor is not None:
+        preprocessed_data = models.preprocessor.transform(df)
+    else:
+        preprocessed_data = preprocess_for_inference(df)
+
+    # === One-hot encode, order the columns and encode label-encoded fields ===
+    with stage("align"):
+        features = models.one_hot.build(preprocessed_data, categoricals)
 
     # === Final Scaling with trained scaler ===
-    preprocessed_data.replace([np.inf, -np.inf], np.nan, inplace=True)
-    preprocessed_data.fillna(0, inplace=True)
-    inference_data_scaled = scaler.transform(preprocessed_data)
+    with stage("scale"):
+        inference_data_scaled = scale_features(models.scaler, features)
 
     # === Meta-model prediction ===
+    # GBR and RF are independent, concurrent with BASE_MODEL_PARALLEL=1 (see baseModelPool.py)
     meta_features = np.zeros((inference_data_scaled.shape[0], 2))
-    meta_features[:, 0] = gbr_model.predict(inference_data_scaled)
-    meta_features[:, 1] = rf_model.predict(inference_data_scaled)
+    meta_features[:, 0], meta_features[:, 1] = run_base_models(
+        lambda: _timed("gbr", models.gbr_model.predict, inference_data_scaled),
+        lambda: _timed("rf", forest_predict, models.rf_model, models.rf_forest, inference_data_scaled),
+        rows=len(inference_data_scaled))
 
-    final_preds = meta_model.predict(meta_features)
-    final_probs = meta_model.predict_proba(meta_features)[:, 1]
+    with stage("meta"):
+        final_preds = models.meta_model.predict(meta_features)
+        final_probs = models.meta_model.predict_proba(meta_features)[:, 1]
 
+    _record_first_prediction()
     return final_preds, final_probs
 
 
 
+def _record_first_prediction():
+    if cold_start["first_prediction_ms"] is not None:
+        return
+    with _first_prediction_lock:
+        if cold_start["first_prediction_ms"] is None:
+            cold_start["first_prediction_ms"] = (time.perf_counter() - _import_started) * 1000.0
+            logging.info(f"[Churn] cold start {json.dumps(cold_start)}")
+
+
+def warmup_frame(models):
+    # One customer at the training defaults: numeric columns 0, each category its first training value
+    one_hot = models.one_hot
+    row = {col: 0 for col in one_hot.passthrough}
+    for col, (vocabulary, _) in one_hot.vocabularies.items():
+        row[col] = vocabulary[0]
+    return pd.DataFrame([row])
+
+
+def warm_up():
+    try:
+        start = time.perf_counter()
+        ChurnPredictionsModels(warmup_frame(current_models()))
+        logging.info(f"[Churn] Warm-up prediction done in {(time.perf_counter() - start) * 1000.0:.0f} ms.")
+        return True
+    except Exception as e:
+        logging.warning(f"[Churn] Warm-up prediction failed, the models stay loaded if that step succeeded: {e}")
+        return False
+
+
 connection_string = ConnectionString()
 
+# Unprocessed customers are claimed in batches (see workQueue.py), so overlapping runs and scaled-out instances
+# never score the same row, until none are left or the wall-clock budget is spent; keep the budget below the
+# Functions timeout (5 min by default)
+BATCH_SIZE = int(os.getenv("CHURN_BATCH_SIZE", "1000"))
+TIME_BUDGET_S = float(os.getenv("CHURN_TIME_BUDGET_S", "240"))
+
+# Batch size adapted to the observed latency and memory, CHURN_BATCH_SIZE is only the first guess (see batchSizer.py)
+batch_sizer = AdaptiveBatchSizer("ChurnTimerTrigger", BATCH_SIZE)
+
+
+# Only customer_id and the raw columns behind X_train_columns.npy are fetched (see columnProjection.py)
+projection = ColumnProjection("ChurnTable", "customer_id", "Churn")
+
+work_queue = WorkQueue("ChurnTable", "customer_id", "Churn")
+
+
+def claim_batch(conn, cursor, size):
+    models = current_models()
+    # The training columns as they come from the table: the plain ones and the multi-category ones before one-hot
+    needed = models.one_hot.passthrough + list(models.one_hot.vocabularies)
+    columns = projection.select_list(cursor, needed, models.version, prefix="inserted.")
+    return work_queue.claim(conn, cursor, columns, size)
+
+
+WRITE_BACK_COLUMNS = {"PredictedChurn": int, "ChurnProbability": float}
+
+# Fixed churn threshold on the meta-model probability, the one persisted with the preprocessor when there is one
+CHURN_THRESHOLD = float(os.getenv("CHURN_THRESHOLD", "0.5"))
+
+
+def churn_threshold(models):
+    threshold = getattr(models.preprocessor, "threshold", None)
+    return CHURN_THRESHOLD if threshold is None else threshold
+
+
+def process_batch(conn, cursor, df, claim_token):
+    # Getting final predictions and probability 
+    final_preds, final_probs = ChurnPredictionsModels(df)
+    # Same threshold for every batch, a customer's prediction does not depend on who else is in it
+    threshold = churn_threshold(current_models())
+    final_preds = (final_probs >= threshold).astype(int)
+
+    print("Predictions:", final_preds)
+    print("Prediction Probabilities:", final_probs)
+
+    df['PredictedChurn'] =  final_preds
+    df['ChurnProbability'] = final_probs
+    df['Processed'] = 1 
+
+    # One staged, set-based UPDATE per batch (WRITE_BACK_MODE=rows for one UPDATE per row, see bulkWriteBack.py)
+    with stage("write_back"):
+        write_back(cursor, "ChurnTable", "customer_id", df, WRITE_BACK_COLUMNS, work_queue.done(), "Churn",
+                   claim=work_queue.claimed_by(claim_token))
+
+        # Committed per batch, a timeout or failure later on keeps the batches already written
+        conn.commit()
+    return int(sum(df['PredictedChurn']))
+
+
 def main(mytimer: TimerRequest) -> None:
     #utc_timestamp = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
     print("Timer trigger function ran.")
     logging.info("Timer trigger function ran.")
+    started = time.perf_counter()
+    num_samples = 0
+    num_churned = 0
+    batches = 0
     try:
-        conn = pyodbc.connect(connection_string)
-
-        cursor = conn.cursor()
-
-        # Fetch rows where churn prediction is not yet processed
-        cursor.execute("SELECT TOP 1000 * FROM ChurnTable WHERE Processed=0")
-        rows = cursor.fetchall()  # by using fetchall, all the rows are returned as tuples, not objects with attributes
-
-        # If there are no new records to process, log and exit
-        if not rows:
-            print("No unprocessed churn data found")
-            logging.info("No unprocessed churn data found.")
-            return
-
-        # Prepare batch dataframe
-        columns = [column[0] for column in cursor.description]
-        df = pd.DataFrame.from_records(rows, columns=columns)
-        # Getting final predictions and probability 
-        
-        final_preds, final_probs = ChurnPredictionsModels(df)
-        max_prob = max(final_probs)
-        if max_prob > 0.7:
-            threshold = 0.5
-        elif max_prob > 0.4:
-            threshold = 0.3
-        else:
-            threshold = 0.1  
-        final_preds = (final_probs >= threshold).astype(int)
-
-        print("Predictions:", final_preds)
-        print("Prediction Probabilities:", final_probs)
-
-        df['PredictedChurn'] =  final_preds
-        df['ChurnProbability'] = final_probs
-        df['Processed'] = 1 
-        #df.to_csv("inference_results.csv", index=False)
-        #print("[] Inference results saved to inference_results.csv")
-       
-        num_samples = len(df['PredictedChurn'])
-        num_churned = sum(df['PredictedChurn'])
-        churn_rate = (num_churned / num_samples) * 100
- 
-        print("\n=== Churn Prediction Summary ===")
-        print(f"Total Customers Inferred: {num_samples}")
-        print(f"Predicted to Churn: {num_churned}")
-        print(f"Churn Rate: {churn_rate:.2f}%")
-
-        for index, row in df.iterrows():
-                    update_query = """
-                        UPDATE ChurnTable
-                        SET PredictedChurn = ?, ChurnProbability = ?, Processed = ?
-                        WHERE customer_id = ?
-                    """
-                    cursor.execute(update_query, 
-                        int(row['PredictedChurn']), 
-                        float(row['ChurnProbability']), 
-                        int(row['Processed']), 
-                        row['customer_id']
-                    )
-
-
-        conn.commit()
-        print(f"Successfully updated {len(df)} churn prediction records.")
-        logging.info(f"Successfully updated {len(df)} churn prediction records.")
+        with timed_run("ChurnTimerTrigger") as run:
+            conn = pyodbc.connect(connection_string)
+
+            cursor = conn.cursor()
+
+            def process(conn, cursor, df, claim_token):
+                nonlocal num_churned
+                num_churned += process_batch(conn, cursor, df, claim_token)
+
+            # Claim rows where churn prediction is not yet processed, one batch after the other
+            # Models loaded (or reloaded) before a batch is timed, not within it
+            drained = work_queue.drain(conn, cursor, claim_batch, process, batch_sizer, TIME_BUDGET_S, started,
+                                       prepare=current_models)
+            num_samples, batches = drained["rows"], drained["batches"]
+
+            # If there are no new records to process, log and exit
+            if batches == 0 and not drained["budget_reached"]:
+                print("No unprocessed churn data found")
+                logging.info("No unprocessed churn data found.")
+                return
+
+            with stage("count_remaining"):
+                cursor.execute("SELECT COUNT(*) FROM ChurnTable WHERE Processed=0")
+                remaining = cursor.fetchall()[0][0]
+
+            elapsed = time.perf_counter() - started
+            churn_rate = (num_churned / num_samples) * 100 if num_samples else 0.0
+            throughput = num_samples / elapsed if elapsed > 0 else 0.0
+            run.set(rows=num_samples, batches=batches, remaining=remaining, batch_size=batch_sizer.next_size())
+
+            print("\n=== Churn Prediction Summary ===")
+            print(f"Total Customers Inferred: {num_samples}")
+            print(f"Predicted to Churn: {num_churned}")
+            print(f"Churn Rate: {churn_rate:.2f}%")
+            print(f"Batches: {batches}, Remaining Unprocessed: {remaining}, Throughput: {throughput:.1f} rows/s")
+
+            print(f"Successfully updated {num_samples} churn prediction records.")
+            logging.info(f"Successfully updated {num_samples} churn prediction records in {batches} batches "
+                         f"({elapsed:.1f}s, {throughput:.1f} rows/s), {remaining} remaining.")
     except Exception as e:
         print(f"Churn processing failed: {e}")
-        logging.error(f"Churn processing failed: {e}")
+        logging.error(f"Churn processing failed after {num_samples} committed records: {e}")
     
     finally:
         if 'cursor' in locals():
@@ -236,4 +249,9 @@ def main(mytimer: TimerRequest) -> None:
     if mytimer.past_due:
         logging.info('The timer is past due!')
  
-    
\ No newline at end of file
+
+
+cold_start["import_ms"] = (time.perf_counter() - _import_started) * 1000.0
+logging.info(f"[Churn] Trigger module imported in {cold_start['import_ms']:.0f} ms.")
+if WARMUP_ENABLED:
+    threading.Thread(target=warm_up, name="churn-warmup", daemon=True).start()
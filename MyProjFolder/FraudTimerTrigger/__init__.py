@@ -1,13 +1,24 @@
 import logging
 import pyodbc
 from azure.functions import TimerRequest
-from datetime import datetime, timezone
 from dotenv import load_dotenv 
-import pandas as pd
-import numpy as np
-import joblib
 import os
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+import time
+from shared_code.batchSizer import AdaptiveBatchSizer
+from shared_code.bulkWriteBack import write_back
+from shared_code.columnProjection import ColumnProjection
+from shared_code.fraudEngine import engine_from_env, print_diagnostics
+from shared_code.predictionOutput import open_writer
+from shared_code.stageTimer import stage, timed_run
+from shared_code.workQueue import WorkQueue
+
+# Loaded once per worker process, reloaded when the files change (FRAUD_MODEL_DIR overrides the location)
+fraud_engine = engine_from_env("Models/FraudModels")
+
+# Local prediction dump: csv (default) or parquet, optionally only ids + predictions
+OUTPUT_FORMAT = os.getenv("FRAUD_OUTPUT_FORMAT", "csv")
+OUTPUT_IDS_ONLY = os.getenv("FRAUD_OUTPUT_IDS_ONLY", "0") == "1"
+OUTPUT_PATH = f"predictions_output.{OUTPUT_FORMAT}"
 
 def ConnectionString():
 
@@ -20,178 +31,116 @@ def ConnectionString():
     return connection_string
 
 def FraudPredictionModels(X_test_df):
-    try:
-        scaler = joblib.load("Models/FraudModels/scaler.pkl")
-        print("[Fraud] Scaler loaded successfully.")
-    except Exception as e:
-        logging.error(f"[Fraud] Failed to load scaler: {e}")
-        raise
+    result = fraud_engine.score(X_test_df)
+    print_diagnostics(result)
+    return result.as_tuple()
 
-    try:
-        label_encoders = joblib.load("Models/FraudModels/label_encoder.pkl")
-        print("[Fraud] Label encoders loaded successfully.")
-    except Exception as e:
-        logging.error(f"[Fraud] Failed to load label encoders: {e}")
-        raise
+load_dotenv()
 
-    try:
-        X_train_columns = np.load("Models/FraudModels/x_column_names.npy", allow_pickle=True).tolist()
-        print("[Fraud] Training column names loaded successfully.")
-    except Exception as e:
-        logging.error(f"[Fraud] Failed to load training column names: {e}")
-        raise
+connection_string = ConnectionString()
 
-    try:
-        lr_model = joblib.load("Models/FraudModels/lr_model.pkl")
-        print("[Fraud] Logistic Regression model loaded successfully.")
-    except Exception as e:
-        logging.error(f"[Fraud] Failed to load Logistic Regression model: {e}")
-        raise
 
-    try:
-        rf_model = joblib.load("Models/FraudModels/rf_model.pkl")
-        print("[Fraud] Random Forest model loaded successfully.")
-    except Exception as e:
-        logging.error(f"[Fraud] Failed to load Random Forest model: {e}")
-        raise
+# Unprocessed transactions are claimed in batches (see workQueue.py), so overlapping runs and scaled-out
+# instances never score the same row, until none are left or the wall-clock budget is spent; keep the budget
+# below the Functions timeout (5 min by default)
+BATCH_SIZE = int(os.getenv("FRAUD_BATCH_SIZE", "10000"))
+TIME_BUDGET_S = float(os.getenv("FRAUD_TIME_BUDGET_S", "240"))
 
-    try:
-        meta_model = joblib.load("Models/FraudModels/meta_model.pkl")
-        print("[Fraud] Meta model loaded successfully.")
-    except Exception as e:
-        logging.error(f"[Fraud] Failed to load Meta model: {e}")
-        raise
-
-    # Save original TransactionID if exists
-    transaction_ids = X_test_df["TransactionID"] if "TransactionID" in X_test_df.columns else pd.Series([f"Index_{i}" for i in range(len(X_test_df))])
-
-    # Add missing columns
-    for col in X_train_columns:
-        if col not in X_test_df.columns:
-            X_test_df[col] = 0
-
-    # Drop unexpected columns
-    extra_cols = [col for col in X_test_df.columns if col not in X_train_columns]
-    if extra_cols:
-        # print(f"Dropping unexpected columns: {extra_cols}")
-        X_test_df.drop(columns=extra_cols, inplace=True)
-
-    # Reorder columns to match training set
-    X_test_df = X_test_df[X_train_columns]
-
-    # Properly encode categorical columns
-    for col in label_encoders:
-        if col in X_test_df.columns:
-            le = label_encoders[col]
-            test_vals = X_test_df[col].astype(str)
-            le_classes = list(le.classes_)
-            if 'unknown' not in le_classes:
-                le_classes.append('unknown')
-                le.classes_ = np.array(le_classes)
-            X_test_df[col] = test_vals.map(lambda x: x if x in le_classes else 'unknown')
-            X_test_df[col] = le.transform(X_test_df[col])
-
-    # Check for missing expected columns
-    missing_cols = set(X_train_columns) - set(X_test_df.columns)
-    for col in missing_cols:
-        #print(f"Adding missing column: {col} (filled with 0s)")
-        X_test_df[col] = 0
-
-    # Ensure the DataFrame has all expected columns in correct order
-    X_test_df = X_test_df[X_train_columns]
-
-    # Convert all to numeric
-    X_test_df = X_test_df.apply(pd.to_numeric, errors='coerce')
-
-    # Check for NaNs
-    if X_test_df.isnull().any().any():
-        print("Found NaN values after numeric conversion:")
-        print(X_test_df.isnull().sum()[X_test_df.isnull().sum() > 0])
-        X_test_df.fillna(0, inplace=True)
-
-    # Scale features
-    X_test_scaled = scaler.transform(X_test_df)
-
-    # Predict
-    lr_predictions = (lr_model.predict_proba(X_test_scaled)[:, 1] > 0.5).astype(int)
-    rf_predictions = rf_model.predict(X_test_scaled)
-    meta_input = np.column_stack([lr_predictions, rf_predictions])
-    meta_predictions = (meta_model.predict(meta_input) < 0.3).astype(int)
-
-
-    return lr_predictions, rf_predictions, meta_input, meta_predictions, transaction_ids
+# Batch size adapted to the observed latency and memory, FRAUD_BATCH_SIZE is only the first guess (see batchSizer.py)
+batch_sizer = AdaptiveBatchSizer("FraudTimerTrigger", BATCH_SIZE)
 
-load_dotenv()
 
-connection_string = ConnectionString()
+# Only TransactionID and the columns of x_column_names.npy are fetched (see columnProjection.py)
+projection = ColumnProjection("FraudTable", "TransactionID", "Fraud")
 
+work_queue = WorkQueue("FraudTable", "TransactionID", "Fraud")
 
-def main(mytimer: TimerRequest) -> None:
-    #utc_timestamp = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
 
-    try:
-        print("Fraud timer trigger started.")
-        logging.info("Fraud timer trigger started.")
-        conn = pyodbc.connect(connection_string)
-        cursor = conn.cursor() 
-
-        cursor.execute("SELECT * FROM FraudTable WHERE Processed = 0")
-        rows = cursor.fetchall()
-
-        if not rows:
-            logging.info("No unprocessed fraud data found.")
-            return
-
-        columns = [col[0] for col in cursor.description]
-        X_test_df = pd.DataFrame.from_records(rows, columns=columns)
-        lr_predictions, rf_predictions, meta_input, meta_predictions, transaction_ids = FraudPredictionModels(X_test_df)
-
-        #Optional: check probability outputs
-        logging.info("\nPredictions completed successfully.")
-        logging.info(f"Logistic Regression Predictions: {lr_predictions[:10]}")
-        logging.info(f"Random Forest Predictions: {rf_predictions[:10]}")
-        logging.info(f"Meta Model Predictions: {meta_predictions[:10]}")
-        # Save predictions
-        X_test_df['LR_Prediction'] = lr_predictions
-        X_test_df['RF_Prediction'] = rf_predictions
-        X_test_df['Meta_Prediction'] = meta_predictions
-        X_test_df['TransactionID'] = transaction_ids
-        X_test_df.to_csv("predictions_output.csv", index=False)
-        print("Predictions saved to predictions_output.csv.")
-
-        # Print readable results
-        print("\nDetailed Prediction Results:")
-        for i in range(len(meta_predictions)):
-            tx_id = transaction_ids.iloc[i]
-            verdict = "YES" if meta_predictions[i] == 1 else "NO"
-            print(f"TransactionID: {tx_id} Fraud: {verdict}")
-
-         
-        for _, record in X_test_df.iterrows():
-            if "TransactionID" in record:
-                update_query = """
-                    UPDATE FraudTable
-                    SET LR_Prediction = ?, RF_Prediction = ?, Meta_Prediction = ?, Processed = 1
-                    WHERE TransactionID = ?
-                """
-                cursor.execute(update_query,
-                    float(record['LR_Prediction']),
-                    float(record['RF_Prediction']),
-                    int(record['Meta_Prediction']),
-                    record['TransactionID']
-                )
-            else:
-                logging.warning("Missing TransactionID for a record, skipping update.")
+def claim_batch(conn, cursor, size):
+    artifacts = fraud_engine.registry.current()
+    columns = projection.select_list(cursor, artifacts.columns, artifacts.version, prefix="inserted.")
+    return work_queue.claim(conn, cursor, columns, size)
+
+
+WRITE_BACK_COLUMNS = {"LR_Prediction": float, "RF_Prediction": float, "Meta_Prediction": int}
+
+
+def process_batch(conn, cursor, writer, X_test_df, claim_token):
+    lr_predictions, rf_predictions, meta_input, meta_predictions, transaction_ids = FraudPredictionModels(X_test_df)
+
+    #Optional: check probability outputs
+    logging.info("\nPredictions completed successfully.")
+    logging.info(f"Logistic Regression Predictions: {lr_predictions[:10]}")
+    logging.info(f"Random Forest Predictions: {rf_predictions[:10]}")
+    logging.info(f"Meta Model Predictions: {meta_predictions[:10]}")
+    # Save predictions
+    X_test_df['LR_Prediction'] = lr_predictions
+    X_test_df['RF_Prediction'] = rf_predictions
+    X_test_df['Meta_Prediction'] = meta_predictions
+    X_test_df['TransactionID'] = transaction_ids
+    with stage("write_output"):
+        writer.write(X_test_df)
 
+    # One summary line per batch, not one print per transaction
+    logging.info(f"[Fraud] {int(meta_predictions.sum())} of {len(meta_predictions)} transactions flagged as fraud.")
 
+    # One staged, set-based UPDATE per batch (WRITE_BACK_MODE=rows for one UPDATE per row, see bulkWriteBack.py)
+    with stage("write_back"):
+        if "TransactionID" in X_test_df.columns:
+            write_back(cursor, "FraudTable", "TransactionID", X_test_df, WRITE_BACK_COLUMNS, work_queue.done(), "Fraud",
+                       claim=work_queue.claimed_by(claim_token))
+        else:
+            logging.warning("Missing TransactionID for a record, skipping update.")
 
+        # Committed per batch, a timeout or failure later on keeps the batches already written
         conn.commit()
-        print("All fraud predictions processed")
-        logging.info("All fraud predictions processed.")
+
+
+def main(mytimer: TimerRequest) -> None:
+    #utc_timestamp = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
+    started = time.perf_counter()
+    writer = None
+
+    def process(conn, cursor, X_test_df, claim_token):
+        nonlocal writer
+        if writer is None:
+            # Label-encoded columns are raw strings in the table, the parquet schema keeps them as such
+            string_columns = fraud_engine.registry.current().encoding_tables
+            writer = open_writer(OUTPUT_PATH, OUTPUT_FORMAT, OUTPUT_IDS_ONLY, string_columns=string_columns)
+        process_batch(conn, cursor, writer, X_test_df, claim_token)
+
+    try:
+        with timed_run("FraudTimerTrigger") as run:
+            print("Fraud timer trigger started.")
+            logging.info("Fraud timer trigger started.")
+            with stage("fetch"):
+                conn = pyodbc.connect(connection_string)
+                cursor = conn.cursor() 
+
+            # Models loaded (or reloaded) before a batch is timed, not within it
+            drained = work_queue.drain(conn, cursor, claim_batch, process, batch_sizer, TIME_BUDGET_S, started,
+                                       prepare=fraud_engine.registry.current)
+            num_rows, batches = drained["rows"], drained["batches"]
+            if batches == 0 and not drained["budget_reached"]:
+                logging.info("No unprocessed fraud data found.")
+                return
+
+            run.set(rows=num_rows, batches=batches, batch_size=batch_sizer.next_size())
+            print(f"Predictions saved to {OUTPUT_PATH}.")
+            print("All fraud predictions processed")
+            logging.info(f"All fraud predictions processed: {num_rows} transactions in {batches} batches.")
+            if fraud_engine.cache is not None:
+                logging.info(f"Fraud verdict cache: {fraud_engine.cache.stats()}")
+            if fraud_engine.cascade is not None:
+                logging.info(f"Fraud cascade paths: {fraud_engine.cascade.stats.snapshot()}")
 
     except Exception as e:
         logging.error(f"Error in fraud prediction trigger: {e}")
 
+    finally:
+        if writer is not None:
+            writer.close()
+
     if mytimer and mytimer.past_due:
         logging.info('The timer is past due!')
 
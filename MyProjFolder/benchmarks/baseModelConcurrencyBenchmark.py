@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from benchmarks.fraudWorkload import has_fraud_models, load_schema, make_dummy_models, synthetic_batch
+from shared_code import baseModelPool
+
+'''
+Wall-clock gain of evaluating the base models concurrently.
+
+    python -m benchmarks.baseModelConcurrencyBenchmark --models Models/FraudModels --churn-models Models/ChurnModels
+    python -m benchmarks.baseModelConcurrencyBenchmark --rows 1000 100000 --threads 2
+
+Per batch size, the time of one call with BASE_MODEL_PARALLEL off and on:
+
+1. fraud: FraudEngine.score end to end (LR || RF, no cascade, no cache);
+   dummy models are generated as in fraudThroughputBenchmark.py when
+   --models has none
+2. churn: GBR || RF on a standardized random matrix, when --churn-models
+   has gbr_model.pkl and rf_model.pkl
+
+Predictions are checked to be identical in both modes. The gain depends on
+the cores available: with one core the threads only interleave.
+'''
+
+BATCH_SIZES = [1_000, 10_000, 100_000]
+
+
+def best_time(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def compare(fn, repeats):
+    baseModelPool.PARALLEL_MIN_ROWS = 0
+    baseModelPool.PARALLEL_ENABLED = False
+    serial_s, expected = best_time(fn, repeats)
+    baseModelPool.PARALLEL_ENABLED = True
+    concurrent_s, actual = best_time(fn, repeats)
+    identical = all(np.array_equal(a, b) for a, b in zip(expected, actual))
+    return {"serial_ms": serial_s * 1000, "concurrent_ms": concurrent_s * 1000, "gain": serial_s / concurrent_s,
+            "identical": identical}
+
+
+def fraud_results(models, batch_sizes, repeats):
+    from shared_code.fraudEngine import FraudEngine
+
+    engine = FraudEngine(models)
+    columns, vocabularies = load_schema(models)
+    results = []
+    for rows in batch_sizes:
+        batch = synthetic_batch(columns, vocabularies, rows)
+        result = compare(lambda: engine.score(batch.copy()).as_tuple()[:4], repeats)
+        results.append({"model": "fraud", "rows": rows, **result})
+    return results
+
+
+def churn_results(models, batch_sizes, repeats):
+    from shared_code.forestArrays import forest_predict
+
+    gbr_model = joblib.load(os.path.join(models, "gbr_model.pkl"))
+    rf_model = joblib.load(os.path.join(models, "rf_model.pkl"))
+    rng = np.random.default_rng(0)
+    results = []
+    for rows in batch_sizes:
+        X = rng.standard_normal((rows, gbr_model.n_features_in_))
+        result = compare(lambda: baseModelPool.run_base_models(
+            lambda: gbr_model.predict(X), lambda: forest_predict(rf_model, None, X)), repeats)
+        results.append({"model": "churn", "rows": rows, **result})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial against concurrent base-model evaluation")
+    parser.add_argument("--models", default="Models/FraudModels")
+    parser.add_argument("--dummy-models", default=os.path.join(tempfile.gettempdir(), "nexguard-bench", "FraudModels"),
+                        help="where dummy models are generated when --models has no artifacts")
+    parser.add_argument("--churn-models", default="Models/ChurnModels")
+    parser.add_argument("--rows", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--threads", type=int, default=baseModelPool.PARALLEL_THREADS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    baseModelPool.PARALLEL_THREADS = args.threads
+    models = args.models
+    if not has_fraud_models(models):
+        models = args.dummy_models
+        if not has_fraud_models(models):
+            print(f"[!] No fraud models in {args.models}, generating dummy models in {models}")
+            make_dummy_models(models)
+
+    results = fraud_results(models, args.rows, args.repeats)
+    if all(os.path.exists(os.path.join(args.churn_models, name)) for name in ("gbr_model.pkl", "rf_model.pkl")):
+        results += churn_results(args.churn_models, args.rows, args.repeats)
+    else:
+        print(f"[!] No churn GBR/RF in {args.churn_models}, skipping churn")
+
+    if args.json:
+        print(json.dumps({"cpus": os.cpu_count(), "threads": args.threads, "results": results}, indent=2))
+    else:
+        print(f"{os.cpu_count()} CPUs, {args.threads} threads")
+        print(f"{'model':>6} {'rows':>10} {'serial ms':>11} {'concurrent ms':>14} {'gain':>6} {'identical':>10}")
+        for r in results:
+            print(f"{r['model']:>6} {r['rows']:>10,} {r['serial_ms']:>11.1f} {r['concurrent_ms']:>14.1f} {r['gain']:>6.2f} {str(r['identical']):>10}")
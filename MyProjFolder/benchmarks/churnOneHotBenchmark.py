@@ -0,0 +1,97 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from shared_code.churnOneHot import ChurnOneHotEncoder
+from shared_code.churnPreprocessing import MULTI_CATEGORICALS
+
+'''
+One-hot encoding of churn batches: get_dummies + reindex against
+ChurnOneHotEncoder.
+
+    python -m benchmarks.churnOneHotBenchmark --models Models/ChurnModels --rows 100000
+
+The training layout is read from X_train_columns.npy in --models; without
+it a layout with the 12 multi-category columns (--categories values each)
+and --numeric numeric columns is made up. A batch of --rows customers is
+drawn from that vocabulary with --unseen-rate unseen categories, already
+preprocessed apart from the multi-category columns, and both paths are run
+--repeat times. Reported per path: best time, rows/s and the peak memory
+allocated during one call (tracemalloc), and whether the matrices agree.
+'''
+
+
+def synthetic_layout(categories=6, numeric=20):
+    columns = [f"num_{i}" for i in range(numeric)]
+    for col in MULTI_CATEGORICALS:
+        columns += [f"{col}_value {j}" for j in range(categories)] + [f"{col}_Unknown"]
+    return columns
+
+
+def synthetic_batch(encoder, rows, unseen_rate=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    features = pd.DataFrame({col: rng.standard_normal(rows) for col in encoder.passthrough})
+    categoricals = {}
+    for col, (vocabulary, _) in encoder.vocabularies.items():
+        values = rng.choice(np.asarray(vocabulary, dtype=object), rows)
+        values[values == "Unknown"] = None
+        values[rng.random(rows) < unseen_rate] = "__unseen__"
+        categoricals[col] = values
+    return features, pd.DataFrame(categoricals)
+
+
+def get_dummies_path(columns, features, categoricals):
+    df = pd.concat([features, categoricals], axis=1)
+    for col in categoricals.columns:
+        df[col] = df[col].fillna('Unknown')
+    df = pd.get_dummies(df, columns=list(categoricals.columns))
+    df = df.reindex(columns=columns, fill_value=0)
+    df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    df.fillna(0, inplace=True)
+    return df.to_numpy(dtype=np.float64)
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, min(times), peak / 2**20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="get_dummies + reindex against ChurnOneHotEncoder")
+    parser.add_argument("--models", default="Models/ChurnModels")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--categories", type=int, default=6, help="values per column of the made-up layout")
+    parser.add_argument("--numeric", type=int, default=20, help="numeric columns of the made-up layout")
+    parser.add_argument("--unseen-rate", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(args.models, "X_train_columns.npy")
+    if os.path.exists(path):
+        columns = np.load(path, allow_pickle=True).tolist()
+    else:
+        print(f"[!] No {path}, using a made-up layout")
+        columns = synthetic_layout(args.categories, args.numeric)
+
+    encoder = ChurnOneHotEncoder(columns)
+    features, categoricals = synthetic_batch(encoder, args.rows, args.unseen_rate)
+    print(f"{args.rows:,} rows, {len(columns)} columns, {len(encoder.vocabularies)} one-hot encoded")
+
+    expected, old_s, old_mib = measure(lambda: get_dummies_path(encoder.columns, features, categoricals), args.repeat)
+    actual, new_s, new_mib = measure(lambda: encoder.build(features, categoricals).matrix, args.repeat)
+
+    print(f"get_dummies + reindex  {old_s * 1000:>9.1f} ms  {args.rows / old_s:>12,.0f} rows/s  peak {old_mib:>8.1f} MiB")
+    print(f"ChurnOneHotEncoder     {new_s * 1000:>9.1f} ms  {args.rows / new_s:>12,.0f} rows/s  peak {new_mib:>8.1f} MiB")
+    print(f"speedup x{old_s / new_s:.1f}, peak memory x{old_mib / new_mib:.1f} lower, identical: {np.array_equal(expected, actual)}")
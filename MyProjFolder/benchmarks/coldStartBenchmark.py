@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+'''
+Cold start of ChurnTimerTrigger: import time and time to first prediction.
+
+    python -m benchmarks.coldStartBenchmark --app-dir . --load-threads 1 4 --repeats 5 --json cold.json
+
+Every run is a fresh interpreter started in --app-dir (where
+Models/ChurnModels lives), the way a Functions worker starts. It imports
+the trigger module, then runs its warm-up (one made-up customer), so the
+first prediction includes loading the models. Reported per
+MODEL_LOAD_THREADS value, as the median over --repeats runs:
+
+1. import_ms: the trigger module import, dependencies included
+2. load_ms: loading and compiling the churn artifacts
+3. first_prediction_ms: from the start of the import to the first
+   prediction
+
+Track these across commits to catch cold-start regressions.
+'''
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _child():
+    start = time.perf_counter()
+    sys.path.insert(0, os.path.abspath(APP_DIR))
+    import ChurnTimerTrigger
+
+    imported = time.perf_counter()
+    predicted = ChurnTimerTrigger.warm_up()
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000.0,
+        "load_ms": ChurnTimerTrigger.cold_start["load_ms"],
+        "first_prediction_ms": (time.perf_counter() - start) * 1000.0,
+        "predicted": predicted,
+    }))
+
+
+def measure(app_dir, load_threads, repeats):
+    env = dict(os.environ, MODEL_LOAD_THREADS=str(load_threads), CHURN_WARMUP="0")
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.coldStartBenchmark", "--child"], cwd=app_dir, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    median = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in ("import_ms", "load_ms", "first_prediction_ms")}
+    return {"load_threads": load_threads, "repeats": repeats, "predicted": all(run["predicted"] for run in runs), **median}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time and time to first prediction of ChurnTimerTrigger")
+    parser.add_argument("--app-dir", default=APP_DIR, help="directory with Models/ChurnModels")
+    parser.add_argument("--load-threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child()
+        sys.exit(0)
+
+    # The child runs with --app-dir as working directory and must still find this package
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.abspath(APP_DIR), os.environ.get("PYTHONPATH")]))
+    results = []
+    for threads in args.load_threads:
+        result = measure(os.path.abspath(args.app_dir), threads, args.repeats)
+        results.append(result)
+        print(f"MODEL_LOAD_THREADS={threads}:  import {result['import_ms']:>8.0f} ms  load {result['load_ms']:>8.0f} ms"
+              f"  first prediction {result['first_prediction_ms']:>8.0f} ms{'' if result['predicted'] else ' (warm-up prediction failed)'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"app_dir": os.path.abspath(args.app_dir), "cpus": os.cpu_count(), "results": results}, f, indent=2)
+        print(f"[✓] Results written to {args.json}")
@@ -0,0 +1,85 @@
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from shared_code.workQueue import FETCH_ARRAYSIZE, fetch_frame
+
+'''
+Peak memory of reading a fetched batch into a DataFrame: fetchall against
+the fetchmany chunks of workQueue.fetch_frame.
+
+    python -m benchmarks.fetchMemoryBenchmark --rows 10000 50000 --columns 400
+
+No database needed: the cursor below hands out fresh row tuples of floats
+on every fetch, the way pyodbc builds them from the network buffer, so only
+the conversion to a DataFrame is measured. Peak memory is the tracemalloc
+high-water mark of one read, in MiB; the frames of both ways are checked
+to be equal.
+'''
+
+BATCH_SIZES = [10_000, 50_000]
+
+
+class SyntheticCursor:
+    def __init__(self, rows, columns, seed=0):
+        self.description = [(f"c{i}",) for i in range(columns)]
+        self.arraysize = 1
+        self._values = np.random.default_rng(seed).standard_normal((rows, columns))
+        self._next = 0
+
+    def _take(self, n):
+        rows = [tuple(row) for row in self._values[self._next:self._next + n].tolist()]
+        self._next += len(rows)
+        return rows
+
+    def fetchall(self):
+        return self._take(len(self._values))
+
+    def fetchmany(self, size):
+        return self._take(size)
+
+
+def read_fetchall(cursor):
+    rows = cursor.fetchall()
+    return pd.DataFrame.from_records(rows, columns=[col[0] for col in cursor.description])
+
+
+def measure(read, rows, columns, arraysize):
+    cursor = SyntheticCursor(rows, columns)
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = read(cursor) if read is read_fetchall else read(cursor, arraysize)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return df, peak, seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fetchall against fetchmany chunks, peak memory of one batch")
+    parser.add_argument("--rows", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--columns", type=int, default=400, help="float columns per row (FraudTable has about 400)")
+    parser.add_argument("--arraysize", type=int, default=FETCH_ARRAYSIZE)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        expected, fetchall_peak, fetchall_s = measure(read_fetchall, rows, args.columns, args.arraysize)
+        actual, chunked_peak, chunked_s = measure(fetch_frame, rows, args.columns, args.arraysize)
+        results.append({"rows": rows, "columns": args.columns, "arraysize": args.arraysize,
+                        "frame_mib": expected.memory_usage(index=False).sum() / 2**20,
+                        "fetchall_peak_mib": fetchall_peak, "fetchmany_peak_mib": chunked_peak,
+                        "fetchall_s": fetchall_s, "fetchmany_s": chunked_s, "identical": expected.equals(actual)})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'rows':>8} {'frame MiB':>10} {'fetchall peak':>14} {'fetchmany peak':>15} {'fetchall s':>11} {'fetchmany s':>12} {'identical':>10}")
+        for r in results:
+            print(f"{r['rows']:>8,} {r['frame_mib']:>10.0f} {r['fetchall_peak_mib']:>14.0f} {r['fetchmany_peak_mib']:>15.0f} "
+                  f"{r['fetchall_s']:>11.2f} {r['fetchmany_s']:>12.2f} {str(r['identical']):>10}")
@@ -0,0 +1,81 @@
+import argparse
+import json
+import time
+
+import joblib
+import numpy as np
+
+from shared_code.forestArrays import export_forest
+
+'''
+Throughput of the NumPy forest evaluator against sklearn's predict.
+
+    python -m benchmarks.forestBenchmark --model Models/FraudModels/rf_model.pkl
+    python -m benchmarks.forestBenchmark --trees 100 --features 94
+
+Without --model a RandomForestClassifier of the given size is trained on
+synthetic data. Every batch size is checked for identical predictions.
+'''
+
+BATCH_SIZES = [1, 100, 10_000, 1_000_000]
+
+
+def dummy_forest(n_trees, n_features, seed=0):
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((20_000, n_features))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + 0.5 * rng.standard_normal(len(X)) > 0.8).astype(int)
+    return RandomForestClassifier(n_estimators=n_trees, random_state=seed).fit(X, y)
+
+
+def best_time(fn, X, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(model, batch_sizes, repeats=3, seed=0):
+    forest = export_forest(model)
+    rng = np.random.default_rng(seed)
+    results = []
+    for rows in batch_sizes:
+        X = rng.standard_normal((rows, forest.n_features))
+        if not np.array_equal(forest.predict(X), model.predict(X)):
+            raise AssertionError(f"predictions differ at {rows} rows")
+
+        # Large batches take seconds per call, one timing is enough
+        n = repeats if rows <= 10_000 else 1
+        sklearn_s = best_time(model.predict, X, n)
+        numpy_s = best_time(forest.predict, X, n)
+        results.append({
+            "rows": rows,
+            "sklearn_rows_per_s": rows / sklearn_s,
+            "numpy_rows_per_s": rows / numpy_s,
+            "speedup": sklearn_s / numpy_s,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NumPy forest evaluator vs sklearn")
+    parser.add_argument("--model", help="pickled RandomForest (defaults to a synthetic one)")
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--features", type=int, default=94)
+    parser.add_argument("--rows", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model) if args.model else dummy_forest(args.trees, args.features)
+    results = run(model, args.rows, args.repeats)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'rows':>10} {'sklearn rows/s':>16} {'numpy rows/s':>16} {'speedup':>8}")
+        for r in results:
+            print(f"{r['rows']:>10} {r['sklearn_rows_per_s']:>16,.0f} {r['numpy_rows_per_s']:>16,.0f} {r['speedup']:>8.2f}")
@@ -0,0 +1,154 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import types
+
+import joblib
+import numpy as np
+import pandas as pd
+
+'''
+Parity check of every fraud scoring entry point against each other.
+
+    python -m benchmarks.fraudParity --models Models/FraudModels --input x_test_inference.csv
+
+1. the original pandas/sklearn pipeline (`reference_predict`, kept here as
+   the specification of the outputs)
+2. FraudEngine.score
+3. fraudPrediction.FraudPredictionModels and score_events
+4. FraudTimerTrigger.FraudPredictionModels; pyodbc and azure.functions
+   are stubbed when they cannot be imported (no ODBC driver, no Functions
+   runtime), only the scoring function is called
+5. fraud_inference.py in memory, streaming and with --workers 2, whose CSV
+   must match the engine's byte for byte
+
+Exits non-zero on the first mismatch. Run it with the same FRAUD_* settings
+(cascade, fused LR, forest backend) as the deployment being checked; with a
+cascade the reference pipeline is skipped since it has no cascade.
+
+tests/test_fraudParity.py runs the comparison of 1. and 2. with the test
+suite, on small dummy models.
+'''
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+FRAUD_INFERENCE = os.path.join(ROOT, "fraud_inference.py")
+
+
+def reference_predict(models, X_test_df):
+    scaler = joblib.load(os.path.join(models, "scaler.pkl"))
+    label_encoders = joblib.load(os.path.join(models, "label_encoder.pkl"))
+    X_train_columns = np.load(os.path.join(models, "x_column_names.npy"), allow_pickle=True).tolist()
+    lr_model = joblib.load(os.path.join(models, "lr_model.pkl"))
+    rf_model = joblib.load(os.path.join(models, "rf_model.pkl"))
+    meta_model = joblib.load(os.path.join(models, "meta_model.pkl"))
+
+    X_test_df = X_test_df.copy()
+    for col in X_train_columns:
+        if col not in X_test_df.columns:
+            X_test_df[col] = 0
+    X_test_df = X_test_df[X_train_columns]
+
+    for col, le in label_encoders.items():
+        if col in X_test_df.columns:
+            classes = list(le.classes_)
+            if "unknown" not in classes:
+                classes.append("unknown")
+                le.classes_ = np.array(classes)
+            values = X_test_df[col].astype(str).map(lambda x: x if x in classes else "unknown")
+            X_test_df[col] = le.transform(values)
+
+    X_test_df = X_test_df.apply(pd.to_numeric, errors="coerce").fillna(0)
+    X_test_scaled = scaler.transform(X_test_df)
+
+    lr_predictions = (lr_model.predict_proba(X_test_scaled)[:, 1] > 0.5).astype(int)
+    rf_predictions = rf_model.predict(X_test_scaled)
+    meta_input = np.column_stack([lr_predictions, rf_predictions])
+    meta_predictions = (meta_model.predict(meta_input) < 0.3).astype(int)
+    return lr_predictions, rf_predictions, meta_input, meta_predictions
+
+
+def stub_missing(name, **attributes):
+    # Placeholder for a module the trigger imports but the parity check never uses
+    try:
+        __import__(name)
+    except ImportError:
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+        print(f"[-] {name} not importable, stubbed")
+
+
+def assert_same(name, expected, actual):
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        a, b = np.asarray(a), np.asarray(b)
+        # NaN on both sides (an RF prediction the cascade skipped) is a match
+        if a.shape != b.shape or not ((a == b) | (pd.isna(a) & pd.isna(b))).all():
+            raise AssertionError(f"{name}: output {i} differs from the engine")
+    print(f"[✓] {name}")
+
+
+def run_cli(models, input_path, output_path, *extra):
+    cmd = [sys.executable, FRAUD_INFERENCE, "--models", models, "--input", input_path, "--output", output_path, *extra]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    with open(output_path, "rb") as f:
+        return f.read()
+
+
+def run(models, input_path, chunksize):
+    # Every caller resolves its model directory through FRAUD_MODEL_DIR
+    os.environ["FRAUD_MODEL_DIR"] = models
+    sys.path.insert(0, os.path.join(ROOT, "MyProjFolder"))
+    from shared_code.cascadeScoring import cascade_from_env
+    from shared_code.fraudEngine import FraudEngine
+    from shared_code.predictionOutput import open_writer
+
+    cascade = cascade_from_env()
+    engine = FraudEngine(models, cascade)
+    X_test_df = pd.read_csv(input_path, dtype=engine.csv_dtypes())
+    result = engine.score(X_test_df)
+    expected = result.as_tuple()
+
+    if cascade is None:
+        assert_same("reference pipeline", reference_predict(models, X_test_df), expected[:4])
+    else:
+        print("[-] reference pipeline skipped, FRAUD_CASCADE is on")
+
+    import fraudPrediction
+    assert_same("fraudPrediction.FraudPredictionModels", expected, fraudPrediction.FraudPredictionModels(X_test_df.copy()))
+    if fraudPrediction.score_events(X_test_df.to_dict("records")) != result.records():
+        raise AssertionError("fraudPrediction.score_events differs from the engine")
+    print("[✓] fraudPrediction.score_events")
+
+    stub_missing("pyodbc")
+    stub_missing("azure")
+    stub_missing("azure.functions", TimerRequest=object)
+    import FraudTimerTrigger
+    assert_same("FraudTimerTrigger.FraudPredictionModels", expected, FraudTimerTrigger.FraudPredictionModels(X_test_df.copy()))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine_csv = os.path.join(tmp, "engine.csv")
+        writer = open_writer(engine_csv)
+        writer.write(result.to_frame())
+        writer.close()
+        with open(engine_csv, "rb") as f:
+            expected_csv = f.read()
+
+        for name, extra in [
+            ("in memory", []),
+            ("streaming", ["--chunksize", str(chunksize)]),
+            ("2 workers", ["--chunksize", str(chunksize), "--workers", "2"]),
+        ]:
+            if run_cli(models, input_path, os.path.join(tmp, "cli.csv"), *extra) != expected_csv:
+                raise AssertionError(f"fraud_inference.py ({name}) output differs from the engine")
+            print(f"[✓] fraud_inference.py ({name})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that every fraud scoring entry point gives the same outputs")
+    parser.add_argument("--models", default="Models/FraudModels")
+    parser.add_argument("--input", default="x_test_inference.csv")
+    parser.add_argument("--chunksize", type=int, default=1000)
+    args = parser.parse_args()
+    run(os.path.abspath(args.models), os.path.abspath(args.input), args.chunksize)
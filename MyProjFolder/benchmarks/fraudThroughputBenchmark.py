@@ -0,0 +1,141 @@
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fraudWorkload import has_fraud_models, load_schema, make_dummy_models, synthetic_batch
+
+'''
+Throughput and latency of FraudPredictionModels by batch size.
+
+    python -m benchmarks.fraudThroughputBenchmark --models Models/FraudModels --json bench.json
+    python -m benchmarks.fraudThroughputBenchmark --rows 1 100 10000 --unknown-rate 0.05 --nan-rate 0.1
+
+Without the real pickles in --models, dummy models are generated once into
+--dummy-models (see fraudWorkload.py). Each batch size runs in a fresh
+process, which imports fraudPrediction (verdict cache off), warms the
+registry up, and calls FraudPredictionModels on one synthetic batch until
+about --target-rows rows have been scored (between --min-calls and
+--max-calls calls). Reported per batch size:
+
+1. rows_per_s over all calls
+2. p50_ms / p99_ms latency of one call
+3. peak_rss_mib of the process (models, batch and scoring included)
+
+The JSON also records the commit and the FRAUD_* / FOREST_* / MODEL_*
+settings, so runs can be compared across commits.
+'''
+
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+def _peak_rss_mib():
+    import resource
+
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(task, results):
+    # Before fraudPrediction is imported: same models everywhere, no cached verdicts
+    os.environ["FRAUD_MODEL_DIR"] = task["models"]
+    os.environ["FRAUD_CACHE_SIZE"] = "0"
+    import fraudPrediction
+
+    columns, vocabularies = load_schema(task["models"])
+    batch = synthetic_batch(columns, vocabularies, task["rows"], task["unknown_rate"], task["nan_rate"], task["seed"])
+
+    latencies = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        fraudPrediction.FraudPredictionModels(batch.head(1))
+        for _ in range(task["calls"]):
+            start = time.perf_counter()
+            fraudPrediction.FraudPredictionModels(batch)
+            latencies.append(time.perf_counter() - start)
+
+    latencies = np.asarray(latencies)
+    results.put({
+        "rows": task["rows"],
+        "calls": task["calls"],
+        "rows_per_s": task["rows"] * len(latencies) / latencies.sum(),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "peak_rss_mib": _peak_rss_mib(),
+    })
+
+
+def calls_for(rows, target_rows, min_calls, max_calls):
+    return max(min_calls, min(max_calls, math.ceil(target_rows / rows)))
+
+
+def run(models, batch_sizes, unknown_rate=0.01, nan_rate=0.01, target_rows=2_000_000, min_calls=3, max_calls=1000, seed=0):
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for rows in batch_sizes:
+        task = {
+            "models": models, "rows": rows, "unknown_rate": unknown_rate, "nan_rate": nan_rate, "seed": seed,
+            "calls": calls_for(rows, target_rows, min_calls, max_calls),
+        }
+        queue = ctx.Queue()
+        process = ctx.Process(target=_measure, args=(task, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        results.append(result)
+        print(f"{result['rows']:>10,} rows  {result['rows_per_s']:>12,.0f} rows/s  p50 {result['p50_ms']:>10.2f} ms"
+              f"  p99 {result['p99_ms']:>10.2f} ms  peak RSS {result['peak_rss_mib']:>8.1f} MiB")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    settings = {k: v for k, v in sorted(os.environ.items()) if k.startswith(("FRAUD_", "FOREST_", "MODEL_"))}
+    return {"commit": commit, "python": platform.python_version(), "cpus": os.cpu_count(), "settings": settings}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and latency of FraudPredictionModels by batch size")
+    parser.add_argument("--models", default="Models/FraudModels")
+    parser.add_argument("--dummy-models", default=os.path.join(tempfile.gettempdir(), "nexguard-bench", "FraudModels"),
+                        help="where dummy models are generated when --models has no artifacts")
+    parser.add_argument("--rows", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--unknown-rate", type=float, default=0.01)
+    parser.add_argument("--nan-rate", type=float, default=0.01)
+    parser.add_argument("--target-rows", type=int, default=2_000_000, help="rows scored per batch size")
+    parser.add_argument("--min-calls", type=int, default=3)
+    parser.add_argument("--max-calls", type=int, default=1000)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    models = args.models
+    if not has_fraud_models(models):
+        models = args.dummy_models
+        if not has_fraud_models(models):
+            print(f"[!] No fraud models in {args.models}, generating dummy models in {models}")
+            make_dummy_models(models)
+    models = os.path.abspath(models)
+
+    results = run(models, args.rows, args.unknown_rate, args.nan_rate, args.target_rows, args.min_calls, args.max_calls)
+    report = {
+        "models": models,
+        "dummy_models": models != os.path.abspath(args.models),
+        "unknown_rate": args.unknown_rate,
+        "nan_rate": args.nan_rate,
+        "environment": environment(),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[✓] Results written to {args.json}")
@@ -0,0 +1,140 @@
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+'''
+Synthetic fraud workloads and dummy fraud models.
+
+    python -m benchmarks.fraudWorkload models --out bench/FraudModels
+    python -m benchmarks.fraudWorkload batch --models Models/FraudModels --rows 100000 --out batch.csv
+
+1. `make_dummy_models` writes the six fraud artifacts (scaler.pkl,
+   label_encoder.pkl, x_column_names.npy, lr_model.pkl, rf_model.pkl,
+   meta_model.pkl) for the schema of predictions_output.csv, with the
+   vocabulary sizes of the IEEE-CIS categoricals and a fully grown random
+   forest, for when the real pickles are not at hand
+2. `synthetic_batch` draws raw rows (categoricals as strings, the way they
+   arrive from FraudTable or Event Hub) matching the x_column_names.npy
+   schema and label-encoder vocabularies of any model directory, with
+   tunable unknown-category and NaN rates
+'''
+
+FEATURE_COLUMNS = (
+    "TransactionID TransactionAmt ProductCD card1 card2 card3 card4 card5 card6 addr1 dist1 dist2 "
+    "P_emaildomain R_emaildomain C1 C3 C5 C7 C9 C13 D1 D2 D3 D4 D5 D6 D7 D8 D10 D11 D12 D13 D14 D15 "
+    "M1 M2 M3 M4 M5 M6 M7 M8 M9 V13 V54 V76 V96 V98 V127 V129 V130 V136 V138 V160 V165 V166 V169 "
+    "V203 V207 V215 V218 V264 V267 V274 V277 V281 V284 V285 V291 V294 V309 V310 V314 V320 V338 "
+    "id_02 id_03 id_12 id_13 id_14 id_15 id_16 id_18 id_30 id_31 id_33 id_34 id_35 id_37 id_38 "
+    "DeviceType DeviceInfo TransactionsPerCard1_24H TransactionAmt_log"
+).split()
+
+# Label-encoded columns and their number of distinct values in the training data
+VOCABULARY_SIZES = {
+    "ProductCD": 5, "card4": 5, "card6": 5, "P_emaildomain": 60, "R_emaildomain": 61,
+    "M1": 3, "M2": 3, "M3": 3, "M4": 4, "M5": 3, "M6": 3, "M7": 3, "M8": 3, "M9": 3,
+    "id_12": 3, "id_15": 4, "id_16": 3, "id_30": 76, "id_31": 131, "id_33": 261, "id_34": 5,
+    "id_35": 3, "id_37": 3, "id_38": 3, "DeviceType": 3, "DeviceInfo": 1787,
+}
+
+UNKNOWN_VALUE = "__unseen__"
+
+
+def _vocabulary(col, size):
+    return np.array(["nan"] + [f"{col}_{i}" for i in range(size - 1)], dtype=object)
+
+
+def make_dummy_models(out_dir, train_rows=50_000, n_trees=100, max_depth=None, fraud_rate=0.035, seed=0):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LinearRegression, LogisticRegression
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.standard_normal((train_rows, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    df["TransactionID"] = np.arange(train_rows) + 2_987_000
+
+    label_encoders = {}
+    for col, size in VOCABULARY_SIZES.items():
+        values = rng.choice(_vocabulary(col, size), train_rows)
+        label_encoders[col] = LabelEncoder().fit(values)
+        df[col] = label_encoders[col].transform(values)
+
+    signal = df["TransactionAmt"] + df["C1"] * df["D1"] + 0.3 * (df["ProductCD"] == 0) + rng.standard_normal(train_rows)
+    y = (signal > np.quantile(signal, 1 - fraud_rate)).astype(int)
+
+    scaler = StandardScaler().fit(df)
+    X_scaled = scaler.transform(df)
+    lr_model = LogisticRegression(max_iter=500).fit(X_scaled, y)
+    rf_model = RandomForestClassifier(n_estimators=n_trees, max_depth=max_depth, n_jobs=-1, random_state=seed).fit(X_scaled, y)
+    rf_model.n_jobs = None
+    meta_input = np.column_stack([lr_model.predict(X_scaled), rf_model.predict(X_scaled)])
+    meta_model = LinearRegression().fit(meta_input, 1 - y)
+
+    os.makedirs(out_dir, exist_ok=True)
+    joblib.dump(scaler, os.path.join(out_dir, "scaler.pkl"))
+    joblib.dump(label_encoders, os.path.join(out_dir, "label_encoder.pkl"))
+    np.save(os.path.join(out_dir, "x_column_names.npy"), np.array(FEATURE_COLUMNS, dtype=object))
+    joblib.dump(lr_model, os.path.join(out_dir, "lr_model.pkl"))
+    joblib.dump(rf_model, os.path.join(out_dir, "rf_model.pkl"))
+    joblib.dump(meta_model, os.path.join(out_dir, "meta_model.pkl"))
+    return out_dir
+
+
+def load_schema(model_dir):
+    columns = np.load(os.path.join(model_dir, "x_column_names.npy"), allow_pickle=True).tolist()
+    label_encoders = joblib.load(os.path.join(model_dir, "label_encoder.pkl"))
+    vocabularies = {col: np.asarray([c for c in le.classes_ if c != "unknown"], dtype=object) for col, le in label_encoders.items()}
+    return columns, vocabularies
+
+
+def synthetic_batch(columns, vocabularies, rows, unknown_rate=0.01, nan_rate=0.01, seed=0, first_id=3_500_000):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col in columns:
+        if col == "TransactionID":
+            data[col] = np.arange(first_id, first_id + rows, dtype=np.int64)
+        elif col in vocabularies:
+            values = rng.choice(vocabularies[col], rows)
+            values[rng.random(rows) < unknown_rate] = UNKNOWN_VALUE
+            values[rng.random(rows) < nan_rate] = None
+            data[col] = values
+        else:
+            values = rng.standard_normal(rows)
+            values[rng.random(rows) < nan_rate] = np.nan
+            data[col] = values
+    return pd.DataFrame(data, columns=columns)
+
+
+def has_fraud_models(model_dir):
+    names = ["scaler.pkl", "label_encoder.pkl", "x_column_names.npy", "lr_model.pkl", "rf_model.pkl", "meta_model.pkl"]
+    return all(os.path.exists(os.path.join(model_dir, name)) for name in names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dummy fraud models and synthetic fraud batches")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    models = commands.add_parser("models", help="write dummy fraud model artifacts")
+    models.add_argument("--out", default="bench/FraudModels")
+    models.add_argument("--train-rows", type=int, default=50_000)
+    models.add_argument("--trees", type=int, default=100)
+    models.add_argument("--max-depth", type=int)
+
+    batch = commands.add_parser("batch", help="write a synthetic batch as CSV")
+    batch.add_argument("--models", default="Models/FraudModels")
+    batch.add_argument("--rows", type=int, default=100_000)
+    batch.add_argument("--unknown-rate", type=float, default=0.01)
+    batch.add_argument("--nan-rate", type=float, default=0.01)
+    batch.add_argument("--seed", type=int, default=0)
+    batch.add_argument("--out", default="x_test_inference.csv")
+    args = parser.parse_args()
+
+    if args.command == "models":
+        make_dummy_models(args.out, args.train_rows, args.trees, args.max_depth)
+        print(f"[✓] Dummy fraud models written to {args.out}")
+    else:
+        columns, vocabularies = load_schema(args.models)
+        synthetic_batch(columns, vocabularies, args.rows, args.unknown_rate, args.nan_rate, args.seed).to_csv(args.out, index=False)
+        print(f"[✓] {args.rows:,} synthetic rows written to {args.out}")
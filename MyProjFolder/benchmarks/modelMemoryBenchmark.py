@@ -0,0 +1,113 @@
+import argparse
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+'''
+Per-worker memory of the model artifacts, unpickled vs memory-mapped.
+
+    python -m shared_code.modelPackage Models/FraudModels Models/ChurnModels
+    python -m benchmarks.modelMemoryBenchmark --models Models/FraudModels Models/ChurnModels --workers 4
+
+For each mode N worker processes are started together. Each one loads every
+.pkl of the model directories with `load_model`, scores one batch with every
+tree model so the pages it uses are resident, and is measured while all N
+are alive:
+
+1. rss: resident pages, shared file pages included in every process
+2. pss: shared pages divided by the number of processes mapping them
+3. uss: pages private to the process
+
+The model cost is the difference to the same process before loading. PSS
+and USS are what shrink when the trees are memory-mapped; RSS still counts
+the shared page-cache copy once per process.
+'''
+
+BATCH_ROWS = 10_000
+
+
+def _memory(process):
+    info = process.memory_full_info()
+    return {"rss": info.rss, "pss": getattr(info, "pss", 0), "uss": info.uss}
+
+
+def _worker(model_dirs, mmap, rows, barrier, results):
+    import psutil
+
+    from shared_code.forestArrays import ForestArrays
+    from shared_code.modelPackage import load_model
+
+    process = psutil.Process()
+    before = _memory(process)
+
+    models = {}
+    for model_dir in model_dirs:
+        for filename in sorted(os.listdir(model_dir)):
+            if filename.endswith(".pkl"):
+                models[os.path.join(model_dir, filename)] = load_model(os.path.join(model_dir, filename), mmap=mmap)
+
+    rng = np.random.default_rng(0)
+    for model in models.values():
+        if isinstance(model, ForestArrays) or hasattr(model, "estimators_"):
+            model.predict(rng.standard_normal((rows, model.n_features_in_)))
+
+    # Measure only once every worker has its models mapped, PSS depends on the other processes
+    barrier.wait()
+    after = _memory(process)
+    results.put({
+        "packed": sorted(path for path, model in models.items() if isinstance(model, ForestArrays)),
+        "before": before,
+        "after": after,
+    })
+    barrier.wait()
+
+
+def measure(model_dirs, workers, mmap, rows=BATCH_ROWS):
+    # spawn, not fork: the workers must not inherit any pages from this process
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker, args=(model_dirs, mmap, rows, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    def mean_mib(stage, key):
+        return sum(r[stage][key] for r in reports) / len(reports) / 2**20
+
+    return {
+        "mode": "mmap" if mmap else "pickle",
+        "workers": workers,
+        "packed_models": reports[0]["packed"],
+        "per_worker_mib": {key: mean_mib("after", key) for key in ("rss", "pss", "uss")},
+        "models_per_worker_mib": {key: mean_mib("after", key) - mean_mib("before", key) for key in ("rss", "pss", "uss")},
+    }
+
+
+def run(model_dirs, workers, rows=BATCH_ROWS):
+    return [measure(model_dirs, workers, mmap=False, rows=rows), measure(model_dirs, workers, mmap=True, rows=rows)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-worker memory of the models, pickled vs memory-mapped")
+    parser.add_argument("--models", nargs="+", default=["Models/FraudModels", "Models/ChurnModels"])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=BATCH_ROWS)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.models, args.workers, args.rows)
+    print(f"{'mode':>8} {'workers':>8} {'rss MiB':>10} {'pss MiB':>10} {'uss MiB':>10}   models only (rss/pss/uss)")
+    for r in results:
+        total, models = r["per_worker_mib"], r["models_per_worker_mib"]
+        print(f"{r['mode']:>8} {r['workers']:>8} {total['rss']:>10.1f} {total['pss']:>10.1f} {total['uss']:>10.1f}"
+              f"   {models['rss']:.1f} / {models['pss']:.1f} / {models['uss']:.1f}")
+    if not results[1]["packed_models"]:
+        print("[!] No packed models found, run python -m shared_code.modelPackage first")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
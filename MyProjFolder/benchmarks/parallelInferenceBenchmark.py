@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+'''
+Scaling of `fraud_inference.py --workers N` with the number of processes.
+
+    python -m benchmarks.parallelInferenceBenchmark --models Models/FraudModels --input big.csv --workers 1 2 4 8
+
+Each worker count runs the CLI end to end (read, score, ordered write) and
+the outputs are compared byte for byte with the single-process run.
+'''
+
+FRAUD_INFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "fraud_inference.py")
+
+
+def run_cli(models, input_path, output_path, workers, chunksize):
+    cmd = [sys.executable, FRAUD_INFERENCE, "--models", models, "--input", input_path,
+           "--output", output_path, "--chunksize", str(chunksize)]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def same_file(a, b):
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        while True:
+            block_a, block_b = fa.read(1 << 20), fb.read(1 << 20)
+            if block_a != block_b:
+                return False
+            if not block_a:
+                return True
+
+
+def run(models, input_path, worker_counts, chunksize):
+    with open(input_path, "rb") as f:
+        rows = sum(1 for _ in f) - 1
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_output = None
+        baseline_s = None
+        for workers in worker_counts:
+            output = os.path.join(tmp, f"out-{workers}.csv")
+            seconds = run_cli(models, input_path, output, workers, chunksize)
+            if baseline_output is None:
+                baseline_output, baseline_s = output, seconds
+            elif not same_file(baseline_output, output):
+                raise AssertionError(f"output with {workers} workers differs from {worker_counts[0]} worker(s)")
+            results.append({
+                "workers": workers,
+                "seconds": seconds,
+                "rows_per_s": rows / seconds,
+                "speedup": baseline_s / seconds,
+            })
+    return {"rows": rows, "cpu_count": os.cpu_count(), "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fraud_inference.py --workers scaling")
+    parser.add_argument("--models", required=True)
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.models, args.input, args.workers, args.chunksize), indent=2))
@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from shared_code.bulkWriteBack import write_back
+
+'''
+Rows/s of the prediction write-back, per row against bulk.
+
+    python -m benchmarks.writeBackBenchmark --rows 1000 10000 100000
+
+Connects with the SQL_SERVER / SQL_DATABASE / SQL_USER / SQL_PASSWORD
+settings of the triggers, creates the session temp table #WriteBackBench
+(an INT key and the fraud prediction columns, --rows unprocessed rows) and
+writes synthetic predictions back to it in both modes, timing the
+write-back and the commit. Nothing outside tempdb is touched; the temp
+table goes away with the connection.
+
+Per-row mode is only run up to --max-row-mode rows, it takes one network
+round trip per row.
+'''
+
+BATCH_SIZES = [1_000, 10_000, 100_000]
+COLUMNS = {"LR_Prediction": float, "RF_Prediction": float, "Meta_Prediction": int}
+
+
+def connection_string():
+    driver = 'ODBC Driver 18 for SQL Server'
+    return (f"Driver={driver};Server={os.getenv('SQL_SERVER')};Database={os.getenv('SQL_DATABASE')};"
+            f"Uid={os.getenv('SQL_USER')};Pwd={os.getenv('SQL_PASSWORD')};"
+            "Encrypt=yes;TrustServerCertificate=no;Connection Timeout=30;")
+
+
+def prepare(conn, rows):
+    cursor = conn.cursor()
+    cursor.execute("IF OBJECT_ID('tempdb..#WriteBackBench') IS NOT NULL DROP TABLE #WriteBackBench")
+    cursor.execute("""
+        CREATE TABLE #WriteBackBench (
+            TransactionID INT PRIMARY KEY,
+            LR_Prediction FLOAT NOT NULL DEFAULT 0,
+            RF_Prediction FLOAT NOT NULL DEFAULT 0,
+            Meta_Prediction INT NOT NULL DEFAULT 0,
+            Processed BIT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.fast_executemany = True
+    cursor.executemany("INSERT INTO #WriteBackBench (TransactionID) VALUES (?)", [(i,) for i in range(rows)])
+    conn.commit()
+    return cursor
+
+
+def predictions(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "TransactionID": np.arange(rows),
+        "LR_Prediction": rng.integers(0, 2, rows).astype(float),
+        "RF_Prediction": rng.integers(0, 2, rows).astype(float),
+        "Meta_Prediction": rng.integers(0, 2, rows),
+    })
+
+
+def measure(conn, rows, mode):
+    cursor = prepare(conn, rows)
+    df = predictions(rows)
+    start = time.perf_counter()
+    write_back(cursor, "#WriteBackBench", "TransactionID", df, COLUMNS, {"Processed": 1}, "Bench", mode)
+    conn.commit()
+    seconds = time.perf_counter() - start
+
+    cursor.execute("SELECT COUNT(*) FROM #WriteBackBench WHERE Processed = 1")
+    written = cursor.fetchall()[0][0]
+    cursor.close()
+    return {"rows": rows, "mode": mode, "seconds": seconds, "rows_per_s": rows / seconds, "all_written": written == rows}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-row against bulk write-back of predictions")
+    parser.add_argument("--rows", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--max-row-mode", type=int, default=10_000, help="largest batch also timed in per-row mode")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    import pyodbc
+
+    load_dotenv()
+    conn = pyodbc.connect(connection_string())
+    results = []
+    try:
+        for rows in args.rows:
+            for mode in ("rows", "bulk"):
+                if mode == "rows" and rows > args.max_row_mode:
+                    continue
+                results.append(measure(conn, rows, mode))
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'rows':>10} {'mode':>6} {'seconds':>9} {'rows/s':>12} {'all written':>12}")
+        for r in results:
+            print(f"{r['rows']:>10,} {r['mode']:>6} {r['seconds']:>9.2f} {r['rows_per_s']:>12,.0f} {str(r['all_written']):>12}")
@@ -6,6 +6,12 @@ import pandas as pd
 from dotenv import load_dotenv
 import os
 import numpy as np
+import threading
+from concurrent.futures import Future
+from shared_code.eventCheckpoints import EventCheckpoints
+from shared_code.fraudEngine import engine_from_env, print_diagnostics
+from shared_code.microBatcher import MicroBatcher
+from shared_code.stageTimer import timed_run
 
 '''
 1. Initialises fast api
@@ -13,8 +19,8 @@ import numpy as np
 3. connects to azure event hub
 
 4. parses json data from the event
-5. converts it into dataframe
-6. runs ai model to predict if its fraud or not
+5. collects events into micro-batches (N events or T ms) and converts each batch into a dataframe
+6. runs ai model to predict if its fraud or not, one call per batch
 7. logs the prediction result to console
 8. save prediction to azure sql (TO DO)
 9. send the alerts/notification (TO DO)
@@ -23,75 +29,59 @@ import numpy as np
 
 app = FastAPI()
 
+# Loaded once per process, reloaded when the files change (FRAUD_MODEL_DIR overrides ".")
+fraud_engine = engine_from_env(".")
 
 
 def FraudPredictionModels(X_test_df):
-    scaler = joblib.load("scaler.pkl")
-    label_encoders = joblib.load("label_encoder.pkl")
-    X_train_columns = np.load("x_column_names.npy", allow_pickle=True).tolist()
-
-    lr_model = joblib.load("lr_model.pkl")
-    rf_model = joblib.load("rf_model.pkl")
-    meta_model = joblib.load("meta_model.pkl") 
-
-    # Save original TransactionID if exists
-    transaction_ids = X_test_df["TransactionID"] if "TransactionID" in X_test_df.columns else pd.Series([f"Index_{i}" for i in range(len(X_test_df))])
-
-    # Add missing columns
-    for col in X_train_columns:
-        if col not in X_test_df.columns:
-            X_test_df[col] = 0
-
-    # Drop unexpected columns
-    extra_cols = [col for col in X_test_df.columns if col not in X_train_columns]
-    if extra_cols:
-        print(f"[!] Dropping unexpected columns: {extra_cols}")
-        X_test_df.drop(columns=extra_cols, inplace=True)
-
-    # Reorder columns to match training set
-    X_test_df = X_test_df[X_train_columns]
-
-    # Properly encode categorical columns
-    for col in label_encoders:
-        if col in X_test_df.columns:
-            le = label_encoders[col]
-            test_vals = X_test_df[col].astype(str)
-            le_classes = list(le.classes_)
-            if 'unknown' not in le_classes:
-                le_classes.append('unknown')
-                le.classes_ = np.array(le_classes)
-            X_test_df[col] = test_vals.map(lambda x: x if x in le_classes else 'unknown')
-            X_test_df[col] = le.transform(X_test_df[col])
-
-    # Check for missing expected columns
-    missing_cols = set(X_train_columns) - set(X_test_df.columns)
-    for col in missing_cols:
-        print(f"[!] Adding missing column: {col} (filled with 0s)")
-        X_test_df[col] = 0
-
-    # Ensure the DataFrame has all expected columns in correct order
-    X_test_df = X_test_df[X_train_columns]
-
-    # Convert all to numeric
-    X_test_df = X_test_df.apply(pd.to_numeric, errors='coerce')
-
-    # Check for NaNs
-    if X_test_df.isnull().any().any():
-        print("[!] Found NaN values after numeric conversion:")
-        print(X_test_df.isnull().sum()[X_test_df.isnull().sum() > 0])
-        X_test_df.fillna(0, inplace=True)
-
-    # Scale features
-    X_test_scaled = scaler.transform(X_test_df)
-
-    # Predict
-    lr_predictions = (lr_model.predict_proba(X_test_scaled)[:, 1] > 0.5).astype(int)
-    rf_predictions = rf_model.predict(X_test_scaled)
-    meta_input = np.column_stack([lr_predictions, rf_predictions])
-    meta_predictions = (meta_model.predict(meta_input) < 0.3).astype(int)
-
-
-    return lr_predictions, rf_predictions, meta_input, meta_predictions, transaction_ids
+    result = fraud_engine.score(X_test_df)
+    print_diagnostics(result)
+    return result.as_tuple()
+
+def score_events(records):
+    # One timing record per micro-batch (STAGE_TIMING=1)
+    with timed_run("FraudEvents") as run:
+        run.set(rows=len(records))
+        return fraud_engine.score(pd.DataFrame.from_records(records)).records()
+
+def score_alone(record):
+    # A failed event is retried on its own, one bad event does not fail the rest of its batch again
+    future = Future()
+    try:
+        future.set_result(score_events([record])[0])
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+# Events that failed every attempt, one JSON line each, to be inspected and sent again
+FRAUD_DEAD_LETTER_PATH = os.getenv("FRAUD_DEAD_LETTER_PATH", "fraud_dead_letter.jsonl")
+dead_letter_lock = threading.Lock()
+
+def dead_letter(partition_context, event, error):
+    line = json.dumps({
+        "partition_id": partition_context.partition_id,
+        "sequence_number": event.sequence_number,
+        "enqueued_time": str(event.enqueued_time),
+        "error": str(error),
+        "body": event.body_as_str(),
+    })
+    with dead_letter_lock, open(FRAUD_DEAD_LETTER_PATH, "a") as f:
+        f.write(line + "\n")
+
+# Scored events are printed and checkpointed once per batch, not once per event (see eventCheckpoints.py)
+event_checkpoints = EventCheckpoints("FraudEvents", dead_letter=dead_letter)
+scored_lines = []
+
+def after_batch():
+    if scored_lines:
+        print("\n".join(scored_lines))
+        scored_lines.clear()
+    event_checkpoints.flush()
+
+# Events are scored in micro-batches of up to N events or T milliseconds
+FRAUD_BATCH_MAX_EVENTS = int(os.getenv("FRAUD_BATCH_MAX_EVENTS", "256"))
+FRAUD_BATCH_MAX_WAIT_MS = float(os.getenv("FRAUD_BATCH_MAX_WAIT_MS", "50"))
+fraud_batcher = MicroBatcher(score_events, FRAUD_BATCH_MAX_EVENTS, FRAUD_BATCH_MAX_WAIT_MS, "FraudBatcher", after_batch)
 
 # Event Hub connection
 EVENT_CONNECTION_STR = os.getenv("EVENTHUB_CONNECTION_STRING")
@@ -99,21 +89,51 @@ EVENTHUB_NAME = os.getenv("EVENTHUB_NAME")
 
 def on_event(partition_context, event):
     data = json.loads(event.body_as_str())
-    df = pd.DataFrame([data])
 
-    prediction = model.predict(df)[0]
-    print(f"Transaction {data['transaction_id']} Prediction: {prediction}")
+    def on_scored(future):
+        # A failed event is retried up to EVENT_MAX_ATTEMPTS times, then dead-lettered
+        if future.exception() is not None:
+            if event_checkpoints.failed(partition_context, event, future.exception()):
+                on_scored(score_alone(data))
+            return
+        result = future.result()
+        scored_lines.append(f"Transaction {data.get('transaction_id')} Prediction: {result['Meta_Prediction']}")
 
-    # TODO: Save to DB, send alert if fraud
+        # TODO: Save to DB, send alert if fraud
 
-    partition_context.update_checkpoint(event)
+        event_checkpoints.succeeded(partition_context, event)
+
+    fraud_batcher.submit(data, on_scored)
 
 @app.on_event("startup")
 async def startup_event():
+    fraud_batcher.start()
     client = EventHubConsumerClient.from_connection_string(
         EVENT_CONNECTION_STR, consumer_group="$Default", eventhub_name=EVENTHUB_NAME
     )
-    client.receive(on_event=on_event, starting_position="-1")
+    # receive() blocks, keep it off the event loop
+    threading.Thread(target=client.receive, kwargs={
+        "on_event": on_event, "starting_position": "-1",
+        # A partition (re)assigned to this consumer resumes at its checkpoint
+        "on_partition_initialize": lambda partition_context: event_checkpoints.reset(partition_context.partition_id),
+    }, daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    fraud_batcher.stop()
+
+@app.get("/metrics/batcher")
+def batcher_metrics():
+    return fraud_batcher.stats()
+
+@app.get("/metrics/cache")
+def cache_metrics():
+    return fraud_engine.cache.stats() if fraud_engine.cache is not None else {"enabled": False}
+
+@app.get("/metrics/cascade")
+def cascade_metrics():
+    # Share of events per path of the LR confidence cascade (FRAUD_CASCADE=1)
+    return fraud_engine.cascade.stats.snapshot() if fraud_engine.cascade is not None else {"enabled": False}
 
 @app.get("/")
 def health():
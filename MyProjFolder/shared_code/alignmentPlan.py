@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+'''
+Feature-alignment plan for the fraud models.
+
+Built once per artifact set from `x_column_names.npy` and the compiled
+encoding tables, it holds:
+
+1. the target column order and a cached source -> target index map per
+   distinct input layout
+2. the coercion rule of every target column (table lookup for label
+   encoded columns, numeric coercion for the rest)
+3. the default value of every target column that is missing from the input
+
+`build` writes each column straight into one preallocated C-contiguous
+matrix, so a batch costs a single allocation instead of several DataFrame
+copies. The values are the same as the old add/drop/reindex/to_numeric/
+fillna sequence: a missing label-encoded column is filled with the code of
+'0' (it used to be added as 0 and then encoded), any other missing column
+with 0, and NaN after coercion with 0.
+'''
+
+
+class SourceMap:
+    def __init__(self, pairs, missing, extra):
+        self.pairs = pairs
+        self.missing = missing
+        self.extra = extra
+
+
+class AlignedBatch:
+    def __init__(self, matrix, columns, extra_columns, nan_counts):
+        self.matrix = matrix
+        self.columns = columns
+        self.extra_columns = extra_columns
+        self.nan_counts = nan_counts
+
+    def to_frame(self):
+        return pd.DataFrame(self.matrix, columns=self.columns, copy=False)
+
+
+class AlignmentPlan:
+    def __init__(self, columns, encoding_tables, dtype=np.float64):
+        self.columns = list(columns)
+        self.dtype = np.dtype(dtype)
+        self.positions = {col: i for i, col in enumerate(self.columns)}
+        self.encoding_tables = {col: table for col, table in encoding_tables.items() if col in self.positions}
+
+        self.defaults = np.zeros(len(self.columns), dtype=self.dtype)
+        for col, table in self.encoding_tables.items():
+            self.defaults[self.positions[col]] = table.code_of("0")
+
+        self._source_maps = {}
+
+    def source_map(self, source_columns):
+        key = tuple(source_columns)
+        cached = self._source_maps.get(key)
+        if cached is not None:
+            return cached
+
+        pairs = []
+        seen = set()
+        for src, col in enumerate(key):
+            tgt = self.positions.get(col)
+            if tgt is not None and tgt not in seen:
+                pairs.append((src, tgt, self.encoding_tables.get(col)))
+                seen.add(tgt)
+        missing = [tgt for tgt in range(len(self.columns)) if tgt not in seen]
+        extra = [col for col in key if col not in self.positions]
+
+        mapping = SourceMap(pairs, missing, extra)
+        # Input layouts are few (one per caller), keep the cache from growing unbounded
+        if len(self._source_maps) < 64:
+            self._source_maps[key] = mapping
+        return mapping
+
+    def _coerce(self, series):
+        values = series.to_numpy()
+        if values.dtype.kind in "biuf":
+            return values
+        return pd.to_numeric(series, errors="coerce").to_numpy(dtype=self.dtype, na_value=np.nan)
+
+    def build(self, df, dtype=None):
+        dtype = self.dtype if dtype is None else np.dtype(dtype)
+        mapping = self.source_map(df.columns)
+        matrix = np.empty((len(df), len(self.columns)), dtype=dtype, order="C")
+
+        for src, tgt, table in mapping.pairs:
+            series = df.iloc[:, src]
+            matrix[:, tgt] = table.encode(series) if table is not None else self._coerce(series)
+        for tgt in mapping.missing:
+            matrix[:, tgt] = self.defaults[tgt]
+
+        nan_counts = {}
+        nan_mask = np.isnan(matrix)
+        if nan_mask.any():
+            counts = nan_mask.sum(axis=0)
+            nan_counts = {self.columns[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+            matrix[nan_mask] = 0
+
+        return AlignedBatch(matrix, self.columns, mapping.extra, nan_counts)
+
+
+def scale_features(scaler, batch, rows=None):
+    matrix = batch.matrix if rows is None else batch.matrix[rows]
+    # Keep the column names when the scaler was fitted on a DataFrame, the frame wraps the matrix without a copy
+    if hasattr(scaler, "feature_names_in_"):
+        return scaler.transform(pd.DataFrame(matrix, columns=batch.columns, copy=False))
+    return scaler.transform(matrix)
@@ -0,0 +1,58 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+Concurrent evaluation of independent base models.
+
+The churn GBR and RF, and the fraud LR and RF (without a cascade), only
+meet again in the meta model, so they can run side by side:
+
+    gbr_out, rf_out = run_base_models(lambda: gbr.predict(X), lambda: rf.predict(X), rows=len(X))
+
+With BASE_MODEL_PARALLEL=1 the calls run on a small shared thread pool
+(BASE_MODEL_THREADS workers). Threads are enough here: tree traversal in
+sklearn's Cython code, the NumPy forest backend and the BLAS products of the
+linear models all run with the GIL released, and threads share the loaded
+models and the feature matrix without copies. While the calls run,
+BLAS/OpenMP pools are limited to cpu_count // number of calls threads each,
+so the concurrent models do not oversubscribe the cores.
+
+Batches under BASE_MODEL_PARALLEL_MIN_ROWS rows, and everything when the
+option is off, run the calls one after the other as before. Results are
+the same either way. Stage timings (stageTimer.py) are kept: each call runs
+in a copy of the caller's context.
+'''
+
+PARALLEL_ENABLED = os.getenv("BASE_MODEL_PARALLEL", "0") == "1"
+PARALLEL_THREADS = int(os.getenv("BASE_MODEL_THREADS", "2"))
+PARALLEL_MIN_ROWS = int(os.getenv("BASE_MODEL_PARALLEL_MIN_ROWS", "1000"))
+
+_executor = None
+_controller = None
+_lock = threading.Lock()
+
+
+def _pool():
+    global _executor, _controller
+    with _lock:
+        if _executor is None:
+            from threadpoolctl import ThreadpoolController
+
+            # Inspecting the loaded BLAS/OpenMP libraries is slow, do it once
+            _controller = ThreadpoolController()
+            _executor = ThreadPoolExecutor(max_workers=PARALLEL_THREADS, thread_name_prefix="base-model")
+    return _executor, _controller
+
+
+def run_base_models(*calls, rows=None, parallel=None):
+    '''Results of the zero-argument `calls`, in order.'''
+    parallel = PARALLEL_ENABLED if parallel is None else parallel
+    if not parallel or len(calls) < 2 or (rows is not None and rows < PARALLEL_MIN_ROWS):
+        return [call() for call in calls]
+
+    executor, controller = _pool()
+    with controller.limit(limits=max(1, (os.cpu_count() or 1) // len(calls))):
+        futures = [executor.submit(contextvars.copy_context().run, call) for call in calls]
+        return [future.result() for future in futures]
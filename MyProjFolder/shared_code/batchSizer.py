@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+'''
+Adaptive batch size for the timer triggers.
+
+Each trigger asks the sizer how many rows to fetch next, then reports how
+long the batch took and how much memory it used:
+
+    size = sizer.next_size(seconds_left)
+    with sizer.measure() as batch:
+        ...fetch up to `size` rows, score them, write them back...
+        batch.rows = len(df)
+
+From every batch the sizer derives the rows/s and the MiB per row, and the
+next size is the largest one expected to stay within both BATCH_TARGET_S
+seconds and BATCH_RSS_BUDGET_MIB of process RSS. A size may at most double
+from one batch to the next; it shrinks at once when a batch ran over
+budget. Sizes stay between BATCH_MIN_ROWS and BATCH_MAX_ROWS, and
+`next_size` also caps the size to what the measured rows/s can finish in
+the time the invocation has left.
+
+The last size and the measured rates are kept in
+<BATCH_STATE_DIR>/<name>_batch_size.json, so the next invocation starts
+from the last good value instead of the trigger's default. On Azure
+Functions the default is $HOME/data/batchSizer: $HOME is the app's
+persistent file share, seen by every instance and kept across cold starts,
+while /tmp is local to an instance and empty after a cold start. Elsewhere
+it is the temp directory.
+
+Peak memory of a batch is the rise of the process high-water mark
+(ru_maxrss) when the batch set a new one, otherwise the RSS at its end.
+'''
+
+TARGET_SECONDS = float(os.getenv("BATCH_TARGET_S", "15"))
+RSS_BUDGET_MIB = float(os.getenv("BATCH_RSS_BUDGET_MIB", "1024"))
+MIN_ROWS = int(os.getenv("BATCH_MIN_ROWS", "100"))
+MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "200000"))
+MAX_GROWTH = 2.0
+
+
+def default_state_dir():
+    # WEBSITE_INSTANCE_ID is set on App Service and Functions hosts, where $HOME (/home, D:\home) persists
+    if os.getenv("WEBSITE_INSTANCE_ID") and os.getenv("HOME"):
+        return os.path.join(os.environ["HOME"], "data", "batchSizer")
+    return tempfile.gettempdir()
+
+
+STATE_DIR = os.getenv("BATCH_STATE_DIR") or default_state_dir()
+
+
+def current_rss_mib():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mib()
+
+
+def peak_rss_mib():
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class BatchMeasurement:
+    def __init__(self, sizer):
+        self.sizer = sizer
+        self.rows = 0
+
+    def __enter__(self):
+        self.start_rss = current_rss_mib()
+        self.start_peak = peak_rss_mib()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        peak = peak_rss_mib()
+        self.peak_rss = peak if peak > self.start_peak else current_rss_mib()
+        # A failed or empty batch says nothing about the right size
+        if exc_type is None and self.rows > 0:
+            self.sizer.observe(self.rows, seconds, self.start_rss, self.peak_rss)
+        return False
+
+
+class AdaptiveBatchSizer:
+    def __init__(self, name, initial_size, target_seconds=TARGET_SECONDS, rss_budget_mib=RSS_BUDGET_MIB,
+                 min_size=MIN_ROWS, max_size=MAX_ROWS, state_dir=STATE_DIR):
+        self.name = name
+        self.target_seconds = target_seconds
+        self.rss_budget_mib = rss_budget_mib
+        self.min_size = min_size
+        self.max_size = max_size
+        self.state_path = os.path.join(state_dir, f"{name}_batch_size.json") if state_dir else None
+        self.size = self._clamp(initial_size)
+        self.rows_per_s = None
+        self.mib_per_row = None
+        self._load()
+
+    def _clamp(self, size):
+        return int(max(self.min_size, min(self.max_size, size)))
+
+    def next_size(self, seconds_left=None):
+        '''Rows to fetch next, capped to what fits in `seconds_left`; 0 when not even the minimum fits.'''
+        if seconds_left is None or not self.rows_per_s:
+            return self.size
+        fits = int(self.rows_per_s * seconds_left)
+        return min(self.size, fits) if fits >= self.min_size else 0
+
+    def measure(self):
+        return BatchMeasurement(self)
+
+    def observe(self, rows, seconds, start_rss_mib, peak_rss_mib):
+        self.rows_per_s = rows / seconds if seconds > 0 else None
+        self.mib_per_row = max(peak_rss_mib - start_rss_mib, 0.0) / rows
+
+        # Only a full batch is evidence that a bigger one is fine, a short last page keeps the size
+        candidates = [rows * MAX_GROWTH if rows >= self.size else self.size]
+        if self.rows_per_s:
+            candidates.append(self.rows_per_s * self.target_seconds)
+        if self.mib_per_row > 0:
+            candidates.append(max(self.rss_budget_mib - start_rss_mib, 0.0) / self.mib_per_row)
+
+        previous = self.size
+        self.size = self._clamp(min(candidates))
+        if self.size != previous:
+            logging.info(f"[{self.name}] Batch size {previous} -> {self.size} "
+                         f"({rows} rows in {seconds:.2f}s, peak RSS {peak_rss_mib:.0f} MiB)")
+        self._save()
+
+    def _load(self):
+        if self.state_path is None:
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            self.size = self._clamp(state["size"])
+            self.rows_per_s = state.get("rows_per_s")
+            self.mib_per_row = state.get("mib_per_row")
+            logging.info(f"[{self.name}] Resuming with batch size {self.size} from {self.state_path}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"[{self.name}] Ignoring batch size state {self.state_path}: {e}")
+
+    def _save(self):
+        if self.state_path is None:
+            return
+        state = {"size": self.size, "rows_per_s": self.rows_per_s, "mib_per_row": self.mib_per_row, "updated_at": time.time()}
+        try:
+            # Written aside and renamed, a concurrent reader never sees half a file; the share is seen by
+            # every instance, so the pid alone does not make the name unique
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp_path = f"{self.state_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logging.warning(f"[{self.name}] Could not save the batch size to {self.state_path}: {e}")
@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from shared_code.fraudEnsemble import predict_fraud
+
+'''
+Confidence-banded cascade for the fraud ensemble.
+
+Rows whose LR probability is below `low` or above `high` are decided by
+LR alone and skip the RF stage (their RF prediction is NaN, see
+fraudEnsemble.py); rows inside [low, high] run the full
+LR -> RF -> meta ensemble. Opt in with FRAUD_CASCADE=1 and tune the band
+with FRAUD_CASCADE_LOW / FRAUD_CASCADE_HIGH.
+
+`stats.snapshot()` gives the share of traffic per path since start-up.
+Before enabling a band, replay held-out rows through both modes:
+
+    python -m shared_code.cascadeScoring <model_dir> <csv> [low] [high]
+'''
+
+CASCADE_ENABLED = os.getenv("FRAUD_CASCADE", "0") == "1"
+CASCADE_LOW = float(os.getenv("FRAUD_CASCADE_LOW", "0.05"))
+CASCADE_HIGH = float(os.getenv("FRAUD_CASCADE_HIGH", "0.95"))
+
+
+class CascadeStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.skipped_low = 0
+        self.skipped_high = 0
+        self.full = 0
+
+    def record(self, skipped_low, skipped_high, full):
+        with self._lock:
+            self.skipped_low += skipped_low
+            self.skipped_high += skipped_high
+            self.full += full
+
+    def snapshot(self):
+        with self._lock:
+            total = self.skipped_low + self.skipped_high + self.full
+            return {
+                "rows": total,
+                "skipped_low": self.skipped_low,
+                "skipped_high": self.skipped_high,
+                "full": self.full,
+                "skipped_fraction": (self.skipped_low + self.skipped_high) / total if total else 0.0,
+            }
+
+
+class Cascade:
+    def __init__(self, low=CASCADE_LOW, high=CASCADE_HIGH):
+        if not 0.0 <= low <= high <= 1.0:
+            raise ValueError(f"invalid cascade band [{low}, {high}]")
+        self.low = low
+        self.high = high
+        self.stats = CascadeStats()
+
+    def route(self, lr_proba):
+        '''Mask of the rows that need the full ensemble.'''
+        below = lr_proba < self.low
+        above = lr_proba > self.high
+        full = ~(below | above)
+        self.stats.record(int(below.sum()), int(above.sum()), int(full.sum()))
+        return full
+
+
+def cascade_from_env():
+    return Cascade(CASCADE_LOW, CASCADE_HIGH) if CASCADE_ENABLED else None
+
+
+def replay_report(artifacts, X_test_df, low=CASCADE_LOW, high=CASCADE_HIGH):
+    batch = artifacts.alignment_plan.build(X_test_df)
+
+    start = time.perf_counter()
+    _, full_rf, _, full_meta = predict_fraud(artifacts, batch)
+    full_s = time.perf_counter() - start
+
+    cascade = Cascade(low, high)
+    start = time.perf_counter()
+    _, cascade_rf, _, cascade_meta = predict_fraud(artifacts, batch, cascade)
+    cascade_s = time.perf_counter() - start
+
+    rows = len(full_meta)
+    # Only the rows the forest scored in both modes, the others have no RF prediction
+    scored = ~np.isnan(cascade_rf)
+    report = cascade.stats.snapshot()
+    report.update({
+        "band": [low, high],
+        "meta_disagreements": int((full_meta != cascade_meta).sum()),
+        "meta_disagreement_rate": float((full_meta != cascade_meta).mean()) if rows else 0.0,
+        "rf_disagreements": int((np.asarray(full_rf)[scored] != cascade_rf[scored]).sum()),
+        "full_seconds": full_s,
+        "cascade_seconds": cascade_s,
+    })
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m shared_code.cascadeScoring <model_dir> <csv> [low] [high]")
+        sys.exit(1)
+
+    from shared_code.modelRegistry import get_fraud_registry
+
+    low = float(sys.argv[3]) if len(sys.argv) > 3 else CASCADE_LOW
+    high = float(sys.argv[4]) if len(sys.argv) > 4 else CASCADE_HIGH
+    artifacts = get_fraud_registry(sys.argv[1]).current()
+    report = replay_report(artifacts, pd.read_csv(sys.argv[2]), low, high)
+    for key, value in report.items():
+        print(f"{key}: {value}")
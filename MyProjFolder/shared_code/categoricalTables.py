@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+'''
+Compiled label-encoding tables.
+
+Each fitted LabelEncoder is turned once into a hashed pd.Index over the
+string form of its classes. A column is then encoded with one
+`get_indexer` call; values outside the vocabulary get a fixed unknown code.
+The loaded encoders are never modified.
+
+The codes match the old `le.classes_ + ['unknown']` + `le.transform` path:
+known values keep their class position and anything else gets the
+position of 'unknown' (appended after the classes when it is not one).
+
+Codes depend on the string form of a value, so CSV input reads the encoded
+columns as text (`csv_dtypes`): left to read_csv's type guessing, a column
+of whole numbers reads as int ("1") in a chunk without NaN and as float
+("1.0") in one with, and the same value would get two codes depending on
+how the file was chunked or sharded.
+'''
+
+UNKNOWN = "unknown"
+
+
+class EncodingTable:
+    def __init__(self, classes):
+        keys = [str(c) for c in classes]
+        self.index = pd.Index(keys, dtype=object)
+        self.unknown_code = keys.index(UNKNOWN) if UNKNOWN in keys else len(keys)
+
+    def encode(self, values):
+        if isinstance(values, pd.Series):
+            values = values.astype(str).to_numpy()
+        else:
+            values = np.asarray(values).astype(str)
+        codes = self.index.get_indexer(values)
+        codes[codes < 0] = self.unknown_code
+        return codes
+
+    def code_of(self, value):
+        return int(self.encode([value])[0])
+
+
+def compile_encoding_tables(label_encoders):
+    return {col: EncodingTable(le.classes_) for col, le in label_encoders.items()}
+
+
+
+def csv_dtypes(encoding_tables):
+    # read_csv dtype map: encoded columns as text, the same for every chunk and shard
+    return {col: str for col in encoding_tables}
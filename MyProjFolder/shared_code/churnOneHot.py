@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from shared_code.alignmentPlan import AlignedBatch
+from shared_code.churnPreprocessing import MULTI_CATEGORICALS
+
+'''
+One-hot encoding of the churn multi-category columns, driven by the
+training layout in `X_train_columns.npy`.
+
+The churn models were trained on `pd.get_dummies` output, so every
+indicator column is named `<column>_<category>`. Built once from those
+names, the encoder holds for each multi-category column the vocabulary of
+training categories and the slot of each one in the training layout.
+`build` then writes a batch straight into one preallocated matrix:
+
+1. the other (already preprocessed) training columns are copied into
+   their slots, a column missing from the batch stays 0
+2. each multi-category column is looked up in its vocabulary in one
+   `get_indexer` pass and a 1 is written into the matching slot; NaN is
+   looked up as 'Unknown', a category never seen in training leaves all
+   of the column's slots at 0
+3. label-encoded columns go through their encoder, inf and NaN become 0
+
+This is what get_dummies + reindex(columns=X_train_columns, fill_value=0)
++ the label encoders + fillna(0) gave, without the variable-width dummy
+frame and the reindex copy.
+'''
+
+
+class ChurnOneHotEncoder:
+    def __init__(self, columns, label_encoders=None, categoricals=MULTI_CATEGORICALS):
+        self.columns = [str(col) for col in columns]
+        self.positions = {col: i for i, col in enumerate(self.columns)}
+        self.label_encoders = {col: le for col, le in (label_encoders or {}).items() if col in self.positions}
+
+        # Longest prefix first, so a category column is never taken for the prefix of another
+        prefixes = sorted(categoricals, key=len, reverse=True)
+        vocabularies = {}
+        indicators = set()
+        for i, col in enumerate(self.columns):
+            for categorical in prefixes:
+                if col.startswith(f"{categorical}_"):
+                    vocabularies.setdefault(categorical, ([], []))
+                    vocabularies[categorical][0].append(col[len(categorical) + 1:])
+                    vocabularies[categorical][1].append(i)
+                    indicators.add(col)
+                    break
+
+        self.vocabularies = {
+            col: (pd.Index(values, dtype=object), np.asarray(slots, dtype=np.intp))
+            for col, (values, slots) in vocabularies.items()
+        }
+        self.passthrough = [col for col in self.columns if col not in indicators]
+
+    def categorical_columns(self, df):
+        return [col for col in self.vocabularies if col in df.columns]
+
+    def build(self, features, categoricals):
+        '''`features` is the preprocessed frame, `categoricals` the raw multi-category columns.'''
+        # Column-major: every write below fills one contiguous column
+        matrix = np.zeros((len(features), len(self.columns)), dtype=np.float64, order="F")
+
+        for col in self.passthrough:
+            if col in features.columns and col not in self.label_encoders:
+                column = matrix[:, self.positions[col]]
+                column[:] = pd.to_numeric(features[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+                column[~np.isfinite(column)] = 0
+
+        rows = np.arange(len(categoricals))
+        for col, (vocabulary, slots) in self.vocabularies.items():
+            if col in categoricals.columns:
+                # Look up the distinct values only; NaN gets code -1, i.e. the 'Unknown' slot appended last
+                codes, uniques = pd.factorize(categoricals[col], use_na_sentinel=True)
+                unique_slots = np.append(vocabulary.get_indexer(uniques.astype(str)), vocabulary.get_indexer(['Unknown']))
+                unique_slots = np.where(unique_slots >= 0, slots[unique_slots], -1)
+                value_slots = unique_slots[codes]
+                known = value_slots >= 0
+                matrix[rows[known], value_slots[known]] = 1.0
+
+        for col, le in self.label_encoders.items():
+            matrix[:, self.positions[col]] = le.transform(self._encoder_input(col, features))
+
+        return AlignedBatch(matrix, self.columns, [], {})
+
+    def _encoder_input(self, col, features):
+        # The values the label encoder saw in the reindexed frame: the column as is, or an int 0 when it
+        # was added by the reindex
+        if col in features.columns:
+            return features[col].astype(str)
+        return np.full(len(features), "0")
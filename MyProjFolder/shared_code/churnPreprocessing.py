@@ -0,0 +1,193 @@
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from shared_code.stageTimer import stage
+
+'''
+Churn preprocessing, fitted once on the training data.
+
+`preprocess_for_inference` is the original transform: it fits a label
+encoder, the NaN medians, the one-hot columns and a StandardScaler on every
+batch it sees, so a customer's features depend on the rest of the batch.
+
+`ChurnPreprocessor` is the same sequence of steps with everything fitted
+on the training data and persisted as one artifact:
+
+1. drop the identifier / leakage columns, map `churn` to 0/1
+2. binary categoricals: fillna('No'), code = position in the training
+   classes (sorted like LabelEncoder); a value never seen in training
+   becomes NaN and is imputed in step 4
+3. multi-valued categoricals: fillna('Unknown') and one-hot columns for
+   the training categories; an unseen category gets all zeros
+4. other object columns to numeric, NaN (and numeric columns missing from
+   the batch) filled with the training medians
+5. numeric columns standardized with the training mean and std
+
+Fitted on a frame, `transform` of that frame gives exactly what
+`preprocess_for_inference` gave for it, and any batch is transformed the
+same way regardless of size or neighbours, so batches can be scored in any
+chunking or in parallel.
+
+The artifact also carries the fixed churn `threshold` on the meta-model
+probability (--threshold, 0.5 by default). It replaces the threshold the
+trigger used to pick from the highest probability of each batch, which
+made a customer's PredictedChurn depend on the rest of the batch too.
+
+    python -m shared_code.churnPreprocessing --data company_data.csv --out Models/ChurnModels/preprocessor.pkl
+'''
+
+DROP_COLUMNS = [
+    'customer_id', 'count', 'zip_code', 'lat_long', 'surname', 'rownumber',
+    'state', 'city', 'latitude', 'longitude', 'churn_reason', 'churn_score',
+    'churn_value', 'geography'
+]
+
+BINARY_CATEGORICALS = [
+    'gender', 'senior_citizen', 'partner', 'dependents', 'phone_service',
+    'paperless_billing', 'complain', 'maritalstatus'
+]
+
+MULTI_CATEGORICALS = [
+    'internet_service', 'online_security', 'online_backup', 'device_protection',
+    'tech_support', 'streaming_tv', 'streaming_movies', 'payment_method',
+    'contract', 'preferredlogindevice', 'preferedordercat', 'preferredpaymentmode'
+]
+
+CHURN_LABELS = {'yes': 1, 'no': 0, 'true': 1, 'false': 0, '1': 1, '0': 0}
+
+
+def _drop_and_map_churn(df):
+    df = df.drop(columns=[col for col in DROP_COLUMNS if col in df.columns], errors='ignore')
+    if 'churn' in df.columns:
+        df['churn'] = df['churn'].astype(str).str.lower().map(CHURN_LABELS).fillna(0).astype(int)
+    return df
+
+
+def preprocess_for_inference(df):
+    df = _drop_and_map_churn(df)
+
+    with stage("encode"):
+        le = LabelEncoder()
+        for col in BINARY_CATEGORICALS:
+            if col in df.columns:
+                df[col] = df[col].fillna('No')
+                df[col] = le.fit_transform(df[col].astype(str))
+
+    with stage("one_hot"):
+        for col in MULTI_CATEGORICALS:
+            if col in df.columns:
+                df[col] = df[col].fillna('Unknown')
+
+        df = pd.get_dummies(df, columns=[col for col in MULTI_CATEGORICALS if col in df.columns])
+
+    with stage("impute"):
+        for col in df.select_dtypes(include='object').columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        df.fillna(df.median(numeric_only=True), inplace=True)
+
+    with stage("batch_scale"):
+        num_cols = df.select_dtypes(include=np.number).columns.tolist()
+        num_cols = [col for col in num_cols if col != 'churn']
+        scaler = StandardScaler()
+        df[num_cols] = scaler.fit_transform(df[num_cols])
+
+    return df
+
+
+class ChurnPreprocessor:
+    def __init__(self, binary_classes, categories, medians, num_cols, num_scaler, threshold=0.5):
+        self.binary_classes = binary_classes
+        self.categories = categories
+        self.medians = medians
+        self.num_cols = num_cols
+        self.num_scaler = num_scaler
+        self.threshold = threshold
+
+    def transform(self, df):
+        df = _drop_and_map_churn(df)
+
+        with stage("encode"):
+            for col, classes in self.binary_classes.items():
+                if col in df.columns:
+                    codes = pd.Index(classes).get_indexer(df[col].fillna('No').astype(str))
+                    df[col] = np.where(codes >= 0, codes, np.nan)
+
+        with stage("one_hot"):
+            dummies = {}
+            for col, values in self.categories.items():
+                if col in df.columns:
+                    column = df[col].fillna('Unknown')
+                    for value in values:
+                        dummies[f"{col}_{value}"] = (column == value).to_numpy()
+            df = df.drop(columns=[col for col in self.categories if col in df.columns])
+            if dummies:
+                df = pd.concat([df, pd.DataFrame(dummies, index=df.index)], axis=1)
+
+        with stage("impute"):
+            for col in df.select_dtypes(include='object').columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+            for col in self.num_cols:
+                if col not in df.columns:
+                    df[col] = np.nan
+            df.fillna(self.medians, inplace=True)
+
+        with stage("standardize"):
+            df[self.num_cols] = self.num_scaler.transform(df[self.num_cols])
+
+        return df
+
+
+def fit_churn_preprocessor(df, threshold=0.5):
+    df = _drop_and_map_churn(df)
+
+    binary_classes = {}
+    for col in BINARY_CATEGORICALS:
+        if col in df.columns:
+            df[col] = df[col].fillna('No')
+            le = LabelEncoder().fit(df[col].astype(str))
+            binary_classes[col] = le.classes_.tolist()
+            df[col] = le.transform(df[col].astype(str))
+
+    categories = {}
+    for col in MULTI_CATEGORICALS:
+        if col in df.columns:
+            df[col] = df[col].fillna('Unknown')
+            # get_dummies orders the new columns by sorted category
+            categories[col] = pd.Index(df[col].unique()).sort_values().tolist()
+    df = pd.get_dummies(df, columns=list(categories))
+
+    for col in df.select_dtypes(include='object').columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    medians = df.median(numeric_only=True)
+    df.fillna(medians, inplace=True)
+
+    num_cols = [col for col in df.select_dtypes(include=np.number).columns if col != 'churn']
+    num_scaler = StandardScaler().fit(df[num_cols])
+    return ChurnPreprocessor(binary_classes, categories, medians, num_cols, num_scaler, threshold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the churn preprocessing on the training data")
+    parser.add_argument("--data", required=True, help="CSV the churn models were trained on")
+    parser.add_argument("--out", default="Models/ChurnModels/preprocessor.pkl")
+    parser.add_argument("--threshold", type=float, default=0.5, help="churn probability from which a customer is predicted to churn")
+    args = parser.parse_args()
+
+    # Fit through the imported module, a class pickled from __main__ could not be loaded by the trigger
+    from shared_code import churnPreprocessing
+
+    train_df = pd.read_csv(args.data, low_memory=False)
+    preprocessor = churnPreprocessing.fit_churn_preprocessor(train_df.copy(), args.threshold)
+
+    # Fitted on the training frame, both transforms must agree on it
+    expected = preprocess_for_inference(train_df.copy())
+    actual = preprocessor.transform(train_df.copy())
+    pd.testing.assert_frame_equal(expected, actual[expected.columns], check_dtype=False)
+
+    joblib.dump(preprocessor, args.out)
+    print(f"[Churn] Preprocessor fitted on {len(train_df):,} rows (threshold {args.threshold}) saved to {args.out}")
@@ -0,0 +1,72 @@
+import logging
+import threading
+
+'''
+Select lists for the unprocessed-rows queries, built from the models'
+feature manifests instead of SELECT *.
+
+The columns a model needs (x_column_names.npy for fraud; for churn the raw
+columns behind X_train_columns.npy) are intersected with the columns the
+table actually has, read once from sys.columns, and the key column is put
+first:
+
+    SELECT TOP (?) [TransactionID], [TransactionAmt], ... FROM FraudTable ...
+
+1. a needed column the table does not have is left out of the query and
+   logged once; scoring fills it the way it always filled columns missing
+   from a batch
+2. table columns no model reads (bookkeeping, free text, wide blobs) never
+   cross the wire
+3. the key column must exist, there is no SELECT * fallback
+
+The same list, prefixed with "inserted.", is the OUTPUT clause of the
+claim statement of workQueue.py.
+
+The list is cached per model version; a model swap with a new manifest
+reads the table columns again.
+'''
+
+
+def quote(name):
+    return "[" + str(name).replace("]", "]]") + "]"
+
+
+def table_columns(cursor, table):
+    cursor.execute("SELECT name FROM sys.columns WHERE object_id = OBJECT_ID(?) ORDER BY column_id", table)
+    return [row[0] for row in cursor.fetchall()]
+
+
+class ColumnProjection:
+    def __init__(self, table, key, label="Model"):
+        self.table = table
+        self.key = key
+        self.label = label
+        self._cached = None
+        self._lock = threading.Lock()
+
+    def select_list(self, cursor, needed, version, prefix=""):
+        # prefix, e.g. "inserted.", for an OUTPUT clause
+        return ", ".join(prefix + quote(col) for col in self.columns(cursor, needed, version))
+
+    def columns(self, cursor, needed, version):
+        cached = self._cached
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        with self._lock:
+            available = table_columns(cursor, self.table)
+            if not available:
+                raise RuntimeError(f"Cannot read the columns of {self.table}")
+            if self.key not in available:
+                raise RuntimeError(f"Key column {self.key} not found in {self.table}")
+
+            present = set(available)
+            columns = [self.key] + [col for col in dict.fromkeys(needed) if col != self.key and col in present]
+            missing = [col for col in dict.fromkeys(needed) if col not in present]
+            if missing:
+                logging.warning(f"[{self.label}] {len(missing)} model columns not in {self.table}, "
+                                f"scored as missing: {missing[:20]}")
+            logging.info(f"[{self.label}] Selecting {len(columns)} of {len(available)} columns of {self.table}")
+
+            self._cached = (version, columns)
+            return columns
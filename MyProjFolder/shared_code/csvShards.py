@@ -0,0 +1,87 @@
+import io
+import os
+
+import pandas as pd
+
+'''
+Byte-range shards of a CSV file.
+
+`byte_shards` cuts the data part of a file (after the header line) into
+ranges that start and end on line boundaries, so every shard can be read
+independently by another process with `read_shard`. Rows must not contain
+quoted newlines, which holds for the transaction exports.
+
+read_csv guesses the column types of every shard (and chunk) on its own;
+give `read_shard` one `dtype` map for all shards where the guess matters,
+e.g. the label-encoded columns (categoricalTables.csv_dtypes).
+'''
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        line = f.readline()
+    columns = pd.read_csv(io.BytesIO(line), nrows=0).columns.tolist()
+    return columns, len(line)
+
+
+def byte_shards(path, n_shards):
+    _, data_start = read_header(path)
+    size = os.path.getsize(path)
+    step = max(1, (size - data_start) // max(1, n_shards))
+
+    boundaries = [data_start]
+    with open(path, "rb") as f:
+        for i in range(1, n_shards):
+            target = data_start + i * step
+            if target <= boundaries[-1] or target >= size:
+                continue
+            f.seek(target - 1)
+            f.readline()
+            offset = f.tell()
+            if boundaries[-1] < offset < size:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+class _RangeRaw(io.RawIOBase):
+    def __init__(self, f, start, end):
+        self._f = f
+        self._remaining = end - start
+        f.seek(start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:min(len(buffer), self._remaining)]
+        n = self._f.readinto(view)
+        self._remaining -= n
+        return n
+
+
+def read_shard(path, start, end, columns, chunksize, dtype=None):
+    with open(path, "rb") as f:
+        reader = io.BufferedReader(_RangeRaw(f, start, end), buffer_size=1 << 20)
+        yield from pd.read_csv(reader, header=None, names=columns, chunksize=chunksize, dtype=dtype)
+
+
+def count_lines(path, start, end, block_size=1 << 24):
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            lines += block.count(b"\n")
+            remaining -= len(block)
+            last = block
+    # A file without a trailing newline still has a row after the last one
+    if end > start and not last.endswith(b"\n"):
+        lines += 1
+    return lines
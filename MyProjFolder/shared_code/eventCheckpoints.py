@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+
+'''
+Event Hub checkpoints for micro-batched scoring.
+
+The callbacks of a batch only record which events were scored
+(`succeeded`) or not (`failed`); `flush`, run once after the batch,
+writes one checkpoint per partition: its highest scored event. So a batch
+costs at most one checkpoint-store write per partition instead of one per
+event.
+
+A failed event is retried up to EVENT_MAX_ATTEMPTS times in all
+(`failed` returns True while the caller should score it again). While it
+is retried its partition is not checkpointed past it; events after it
+that scored fine wait and are checkpointed once it is settled. An event
+that fails its last attempt is dead-lettered: logged, handed to the
+`dead_letter(partition_context, event, error)` callback for a separate
+record, and counted as done, so the checkpoint moves past it. `reset`
+clears the state of a partition when it is (re)initialized.
+'''
+
+EVENT_MAX_ATTEMPTS = int(os.getenv("EVENT_MAX_ATTEMPTS", "3"))
+
+
+class EventCheckpoints:
+    def __init__(self, label="Events", max_attempts=None, dead_letter=None):
+        self.label = label
+        self.max_attempts = EVENT_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.dead_letter = dead_letter
+        self.dead_lettered = 0
+        # partition -> {sequence number: (partition_context, event)} scored, not checkpointed yet
+        self._done = {}
+        # partition -> {sequence number: attempts} failed, being retried
+        self._retrying = {}
+        self._lock = threading.Lock()
+
+    def succeeded(self, partition_context, event):
+        partition = partition_context.partition_id
+        with self._lock:
+            self._retrying.get(partition, {}).pop(event.sequence_number, None)
+            self._done.setdefault(partition, {})[event.sequence_number] = (partition_context, event)
+
+    def failed(self, partition_context, event, error=None):
+        '''Record a failed attempt; True when the event should be scored again, False once it is dead-lettered.'''
+        partition = partition_context.partition_id
+        with self._lock:
+            retrying = self._retrying.setdefault(partition, {})
+            attempts = retrying.get(event.sequence_number, 0) + 1
+            if attempts < self.max_attempts:
+                retrying[event.sequence_number] = attempts
+                retry = True
+            else:
+                retrying.pop(event.sequence_number, None)
+                self._done.setdefault(partition, {})[event.sequence_number] = (partition_context, event)
+                self.dead_lettered += 1
+                retry = False
+
+        if retry:
+            logging.warning(f"[{self.label}] Event {event.sequence_number} of partition {partition} failed "
+                            f"(attempt {attempts} of {self.max_attempts}), retrying: {error}")
+            return True
+        logging.error(f"[{self.label}] Event {event.sequence_number} of partition {partition} failed "
+                      f"{attempts} times, dead-lettered: {error}")
+        if self.dead_letter is not None:
+            try:
+                self.dead_letter(partition_context, event, error)
+            except Exception as e:
+                logging.error(f"[{self.label}] Dead-lettering event {event.sequence_number} of partition {partition} failed: {e}")
+        return False
+
+    def reset(self, partition_id):
+        with self._lock:
+            self._done.pop(partition_id, None)
+            self._retrying.pop(partition_id, None)
+
+    def flush(self):
+        checkpoints = []
+        with self._lock:
+            for partition, done in self._done.items():
+                retrying = self._retrying.get(partition)
+                # Never past an event that is still being retried
+                limit = min(retrying) if retrying else None
+                ready = [seq for seq in done if limit is None or seq < limit]
+                if not ready:
+                    continue
+                checkpoints.append((partition, done[max(ready)]))
+                for seq in ready:
+                    del done[seq]
+        for partition, (partition_context, event) in checkpoints:
+            try:
+                partition_context.update_checkpoint(event)
+            except Exception as e:
+                logging.error(f"[{self.label}] Checkpoint of partition {partition} failed: {e}")
@@ -0,0 +1,266 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+'''
+Vectorized NumPy evaluator for fitted sklearn random forests (and gradient
+boosting regressors).
+
+All trees are exported into flat node arrays (feature, threshold, children,
+leaf, value) with one global node id space and a root id per tree. Leaves
+point to themselves, so a batch is evaluated level by level: every active
+(row, tree) pair does one feature gather, one compare and one child gather
+per level. Pairs that reached a leaf are dropped from the active set every
+few levels so deep trees do not pay for their shortest paths' idle levels.
+
+Predictions are identical to sklearn: inputs are float32 like in the Cython
+tree and every float64 threshold t is stored as the largest float32 <= t, so
+`x <= threshold` gives the same branch. Tree outputs are accumulated in tree
+order and divided by the number of trees, and classifier leaves are
+normalized the same way as DecisionTreeClassifier.predict_proba. A
+GradientBoostingRegressor is exported with `scale` (its learning rate) and
+`offset` (its constant init prediction) and accumulated as
+offset + scale * tree, stage by stage, like sklearn's predict_stages.
+
+The arrays are saved as plain .npy files so `load_forest(dir, mmap_mode='r')`
+shares one page-cache copy between processes.
+
+FOREST_BACKEND selects the evaluator: `sklearn` (default), `numpy`, or
+`auto`, which uses the arrays for batches up to FOREST_AUTO_MAX_ROWS rows.
+The level-by-level evaluator removes sklearn's per-call overhead and wins
+on small batches; on large batches of deep, fully grown trees sklearn's
+Cython traversal stays faster (see benchmarks/forestBenchmark.py).
+Models memory-mapped with MODEL_MMAP=1 are ForestArrays themselves and
+always use this evaluator (see modelPackage.py).
+'''
+
+FOREST_BACKEND = os.getenv("FOREST_BACKEND", "sklearn")
+FOREST_AUTO_MAX_ROWS = int(os.getenv("FOREST_AUTO_MAX_ROWS", "1000"))
+
+ARRAY_NAMES = ["feature", "threshold", "children", "leaf", "value", "roots"]
+
+# (row, tree) pairs evaluated at once, bounds the temporary arrays of one block
+BLOCK_PAIRS = 1 << 20
+
+# Levels between two compactions of the active (row, tree) pairs
+COMPACT_EVERY = 4
+
+
+class ForestArrays:
+    def __init__(self, feature, threshold, children, leaf, value, roots, max_depth, n_features, classes=None,
+                 scale=None, offset=0.0):
+        self.feature = feature
+        self.threshold = threshold
+        # children[2 * node] is the right child, children[2 * node + 1] the left one
+        self.children = children
+        self.leaf = leaf
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.classes = classes
+        # Boosted ensembles: offset + scale * sum of trees instead of the mean of trees
+        self.scale = scale
+        self.offset = offset
+
+    @property
+    def is_classifier(self):
+        return self.classes is not None
+
+    # sklearn-style names, so the arrays can stand in for the fitted model
+    @property
+    def classes_(self):
+        return self.classes
+
+    @property
+    def n_features_in_(self):
+        return self.n_features
+
+    def _leaves(self, X):
+        n_rows = X.shape[0]
+        n_trees = len(self.roots)
+        flat = X.ravel()
+
+        node = np.tile(self.roots, n_rows)
+        active = np.arange(n_rows * n_trees, dtype=np.int64)
+        offsets = np.repeat(np.arange(n_rows, dtype=np.int64) * self.n_features, n_trees)
+        current = node
+
+        for level in range(self.max_depth):
+            go_left = flat[offsets + self.feature[current]] <= self.threshold[current]
+            current = self.children[2 * current + go_left]
+
+            if (level + 1) % COMPACT_EVERY == 0 and level + 1 < self.max_depth:
+                done = self.leaf[current]
+                if done.all():
+                    break
+                if done.any():
+                    node[active[done]] = current[done]
+                    live = ~done
+                    active, offsets, current = active[live], offsets[live], current[live]
+
+        node[active] = current
+        return node.reshape(n_rows, n_trees)
+
+    def _accumulate(self, X):
+        out = np.zeros((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        if self.scale is not None:
+            out += self.offset
+        n_trees = len(self.roots)
+        step = max(1, BLOCK_PAIRS // n_trees)
+        for start in range(0, X.shape[0], step):
+            block = X[start:start + step]
+            node = self._leaves(block)
+            acc = out[start:start + step]
+            for t in range(n_trees):
+                if self.scale is None:
+                    acc += self.value[node[:, t]]
+                else:
+                    acc += self.scale * self.value[node[:, t]]
+        if self.scale is None:
+            out /= n_trees
+        return out
+
+    def _prepare(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features, got shape {X.shape}")
+        return X
+
+    def predict_proba(self, X):
+        return self._accumulate(self._prepare(X))
+
+    def predict(self, X):
+        out = self._accumulate(self._prepare(X))
+        if self.is_classifier:
+            return self.classes.take(np.argmax(out, axis=1), axis=0)
+        return out[:, 0]
+
+
+def _floor_float32(values):
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _boosting_params(model):
+    '''(trees, scale, offset) of a GradientBoostingRegressor with a constant init.'''
+    if hasattr(model, "classes_"):
+        raise ValueError("gradient boosting classifiers are not supported")
+    if model.estimators_.shape[1] != 1:
+        raise ValueError("multi-output boosting is not supported")
+    if model.init_ == "zero":
+        offset = 0.0
+    else:
+        offset = np.asarray(model.init_.predict(np.zeros((2, model.n_features_in_))), dtype=np.float64).ravel()
+        if offset[0] != offset[1]:
+            raise ValueError("only a constant init estimator is supported")
+        offset = float(offset[0])
+    return model.estimators_[:, 0], float(model.learning_rate), offset
+
+
+def export_forest(model):
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("multi-output forests are not supported")
+
+    estimators, scale, base = model.estimators_, None, 0.0
+    if hasattr(model, "learning_rate"):
+        estimators, scale, base = _boosting_params(model)
+
+    classes = getattr(model, "classes_", None)
+    features, thresholds, all_children, leaves, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        ids = np.arange(n) + offset
+
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = np.where(is_leaf, 0.0, tree.threshold)
+        left = np.where(is_leaf, ids, tree.children_left + offset)
+        right = np.where(is_leaf, ids, tree.children_right + offset)
+        children = np.empty(2 * n, dtype=np.int64)
+        children[0::2] = right
+        children[1::2] = left
+
+        value = tree.value[:, 0, :].astype(np.float64)
+        if classes is not None:
+            value = value[:, :len(classes)]
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+
+        features.append(feature)
+        thresholds.append(threshold)
+        all_children.append(children)
+        leaves.append(is_leaf)
+        values.append(value)
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    return ForestArrays(
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=_floor_float32(np.concatenate(thresholds)),
+        children=np.concatenate(all_children).astype(np.int32),
+        leaf=np.concatenate(leaves),
+        value=np.ascontiguousarray(np.concatenate(values)),
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=max_depth,
+        n_features=model.n_features_in_,
+        classes=None if classes is None else np.asarray(classes),
+        scale=scale,
+        offset=base,
+    )
+
+
+def save_forest(forest, directory):
+    os.makedirs(directory, exist_ok=True)
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(directory, f"{name}.npy"), getattr(forest, name))
+    meta = {"max_depth": forest.max_depth, "n_features": forest.n_features, "scale": forest.scale, "offset": forest.offset}
+    if forest.classes is not None:
+        np.save(os.path.join(directory, "classes.npy"), forest.classes)
+    with open(os.path.join(directory, "forest.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def load_forest(directory, mmap_mode="r"):
+    with open(os.path.join(directory, "forest.json")) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+    classes_path = os.path.join(directory, "classes.npy")
+    classes = np.load(classes_path, allow_pickle=True) if os.path.exists(classes_path) else None
+    return ForestArrays(classes=classes, **arrays, **meta)
+
+
+def compile_forest(model, label="Model", probe_rows=256):
+    # Already loaded from a packed (memory-mapped) model
+    if isinstance(model, ForestArrays):
+        return model
+    try:
+        forest = export_forest(model)
+    except (AttributeError, ValueError) as e:
+        logging.warning(f"[{label}] NumPy forest unavailable, using sklearn: {e}")
+        return None
+
+    probe = np.random.default_rng(0).standard_normal((probe_rows, forest.n_features))
+    if not np.array_equal(forest.predict(probe), model.predict(probe)):
+        logging.warning(f"[{label}] NumPy forest failed its self-check, using sklearn")
+        return None
+    return forest
+
+
+def forest_enabled():
+    return FOREST_BACKEND in ("numpy", "auto")
+
+
+def forest_predict(model, forest, X):
+    if forest is not None and (FOREST_BACKEND == "numpy" or len(X) <= FOREST_AUTO_MAX_ROWS):
+        return forest.predict(X)
+    return model.predict(X)
@@ -0,0 +1,176 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from shared_code.cascadeScoring import cascade_from_env
+from shared_code.categoricalTables import csv_dtypes
+from shared_code.fraudEnsemble import meta_rf_input, predict_fraud, rf_label_dtype
+from shared_code.modelRegistry import get_fraud_registry
+from shared_code.predictionCache import CACHE_SIZE, PredictionCache, row_keys
+from shared_code.stageTimer import stage
+
+'''
+Fraud inference engine shared by the CLI (fraud_inference.py), the Event
+Hub service (fraudPrediction.py) and FraudTimerTrigger.
+
+1. artifacts come from the process-wide registry of `model_dir`
+   (with `engine_from_env`, FRAUD_MODEL_DIR overrides the caller's default)
+2. `score(df)` aligns, encodes and scores one batch and returns a
+   FraudResult, nothing is printed on the way
+3. `score_to(chunks, writer)` scores a stream of batches into any object
+   with `write(df)`, e.g. the writers of predictionOutput.py
+4. diagnostics (dropped columns, NaN counts) stay on the result, callers
+   report them once with `print_diagnostics`
+5. with a PredictionCache (on by default in `engine_from_env`, see
+   predictionCache.py) rows seen before are answered from the cache and
+   only the rest of the batch runs through the ensemble
+
+Check that the callers still agree with each other after a change:
+
+    python -m benchmarks.fraudParity --models <model_dir> --input <csv>
+'''
+
+FRAUD_MODEL_DIR = os.getenv("FRAUD_MODEL_DIR")
+
+
+class FraudResult:
+    def __init__(self, lr_predictions, rf_predictions, meta_input, meta_predictions, transaction_ids, batch, cached=None):
+        self.lr_predictions = lr_predictions
+        self.rf_predictions = rf_predictions
+        self.meta_input = meta_input
+        self.meta_predictions = meta_predictions
+        self.transaction_ids = transaction_ids
+        # Aligned batch of the rows that were scored (None when every row came from the cache)
+        self.batch = batch
+        self.cached = cached
+
+    def __len__(self):
+        return len(self.meta_predictions)
+
+    def as_tuple(self):
+        '''The historical FraudPredictionModels return value.'''
+        return self.lr_predictions, self.rf_predictions, self.meta_input, self.meta_predictions, self.transaction_ids
+
+    def to_frame(self):
+        '''Aligned features plus the three predictions and TransactionID.'''
+        if self.cached is not None and self.cached.any():
+            raise ValueError("the aligned features of cached rows are not kept")
+        output_df = self.batch.to_frame()
+        output_df['LR_Prediction'] = self.lr_predictions
+        output_df['RF_Prediction'] = self.rf_predictions
+        output_df['Meta_Prediction'] = self.meta_predictions
+        output_df['TransactionID'] = self.transaction_ids.to_numpy()
+        return output_df
+
+    def records(self):
+        return [
+            {
+                "TransactionID": self.transaction_ids.iloc[i],
+                "LR_Prediction": int(self.lr_predictions[i]),
+                # None for a row the cascade did not send through the forest
+                "RF_Prediction": None if np.isnan(self.rf_predictions[i]) else float(self.rf_predictions[i]),
+                "Meta_Prediction": int(self.meta_predictions[i]),
+            }
+            for i in range(len(self))
+        ]
+
+
+class FraudEngine:
+    def __init__(self, model_dir="Models/FraudModels", cascade=None, cache=None):
+        self.model_dir = model_dir
+        self.registry = get_fraud_registry(self.model_dir)
+        self.cascade = cascade
+        self.cache = cache
+
+    def csv_dtypes(self):
+        '''read_csv dtypes for input files, see categoricalTables.py.'''
+        return csv_dtypes(self.registry.current().encoding_tables)
+
+    def score(self, X_test_df, first_index=0):
+        # One snapshot per batch, a reload never mixes two artifact versions
+        artifacts = self.registry.current()
+        if self.cache is not None and self.cache.enabled and "TransactionID" in X_test_df.columns:
+            return self._score_cached(artifacts, X_test_df)
+        return self._score(artifacts, X_test_df, first_index)
+
+    def _score(self, artifacts, X_test_df, first_index=0):
+        # Save original TransactionID if exists
+        if "TransactionID" in X_test_df.columns:
+            transaction_ids = X_test_df["TransactionID"].reset_index(drop=True)
+        else:
+            transaction_ids = pd.Series([f"Index_{first_index + i}" for i in range(len(X_test_df))])
+
+        # Build the model matrix in one pass with the precompiled alignment plan (encoding included)
+        with stage("encode_align"):
+            batch = artifacts.alignment_plan.build(X_test_df)
+
+        # Predict (optionally through the confidence-banded cascade)
+        lr_predictions, rf_predictions, meta_input, meta_predictions = predict_fraud(artifacts, batch, self.cascade)
+        return FraudResult(lr_predictions, rf_predictions, meta_input, meta_predictions, transaction_ids, batch)
+
+    def _score_cached(self, artifacts, X_test_df):
+        with stage("cache_lookup"):
+            keys = row_keys(X_test_df)
+            self.cache.bind_version(artifacts.version)
+            verdicts = self.cache.get_many(keys)
+        cached = np.array([verdict is not None for verdict in verdicts], dtype=bool)
+
+        batch = None
+        if not cached.all():
+            # Duplicates inside the batch are scored once
+            first_seen = {}
+            for pos in np.flatnonzero(~cached):
+                first_seen.setdefault(keys[pos], pos)
+            positions = list(first_seen.values())
+
+            scored = self._score(artifacts, X_test_df.iloc[positions])
+            batch = scored.batch
+            new = list(zip(scored.lr_predictions.tolist(), scored.rf_predictions.tolist(), scored.meta_predictions.tolist()))
+            self.cache.put_many(first_seen.keys(), new, artifacts.version)
+            by_key = dict(zip(first_seen.keys(), new))
+            verdicts = [verdict if verdict is not None else by_key[key] for key, verdict in zip(keys, verdicts)]
+
+        lr_predictions = np.array([verdict[0] for verdict in verdicts], dtype=int)
+        # Float with a cascade, its rows that skipped the forest are NaN
+        rf_dtype = np.float64 if self.cascade is not None else rf_label_dtype(artifacts.rf_model)
+        rf_predictions = np.array([verdict[1] for verdict in verdicts], dtype=rf_dtype)
+        meta_predictions = np.array([verdict[2] for verdict in verdicts], dtype=int)
+        meta_input = np.column_stack([lr_predictions, meta_rf_input(lr_predictions, rf_predictions)])
+        transaction_ids = X_test_df["TransactionID"].reset_index(drop=True)
+        return FraudResult(lr_predictions, rf_predictions, meta_input, meta_predictions, transaction_ids, batch, cached)
+
+    def score_to(self, chunks, writer, first_index=0, progress=None):
+        stats = {"rows": 0, "frauds": 0, "extra_columns": None, "nan_counts": {}}
+        for chunk in chunks:
+            result = self.score(chunk, first_index=first_index + stats["rows"])
+            writer.write(result.to_frame())
+
+            if stats["extra_columns"] is None:
+                stats["extra_columns"] = result.batch.extra_columns
+            for col, count in result.batch.nan_counts.items():
+                stats["nan_counts"][col] = stats["nan_counts"].get(col, 0) + count
+            stats["rows"] += len(result)
+            stats["frauds"] += int(result.meta_predictions.sum())
+            if progress is not None:
+                progress(stats)
+        return stats
+
+
+def print_diagnostics(result):
+    if result.batch is None:
+        return
+    if result.batch.extra_columns:
+        print(f"[!] Dropping unexpected columns: {result.batch.extra_columns}")
+
+    # Check for NaNs
+    if result.batch.nan_counts:
+        print("[!] Found NaN values after numeric conversion:")
+        print(pd.Series(result.batch.nan_counts))
+
+
+def engine_from_env(model_dir="Models/FraudModels"):
+    # FRAUD_MODEL_DIR overrides the caller's default, opt-in LR confidence cascade (FRAUD_CASCADE=1),
+    # verdict cache unless FRAUD_CACHE_SIZE=0
+    cache = PredictionCache() if CACHE_SIZE > 0 else None
+    return FraudEngine(FRAUD_MODEL_DIR or model_dir, cascade_from_env(), cache)
@@ -0,0 +1,91 @@
+import numpy as np
+
+from shared_code.alignmentPlan import scale_features
+from shared_code.baseModelPool import run_base_models
+from shared_code.forestArrays import forest_predict
+from shared_code.stageTimer import stage
+
+'''
+LR -> RF -> meta stage of the fraud models on an aligned batch.
+
+1. LR probability, from the fused weights on the raw matrix when they are
+   compiled, otherwise scaler.transform + lr_model
+2. RF on the scaled matrix, built only for the rows the RF stage scores
+3. meta model on [LR prediction, RF prediction]
+
+With a cascade (see cascadeScoring.py) rows whose LR probability is outside
+the uncertainty band skip the RF stage. The meta model takes their LR
+prediction in the RF slot of its input (`meta_input`), but their returned
+RF prediction is NaN (NULL in FraudTable, empty in the CSV), so a reader
+can tell the rows the forest did not score from the ones it did.
+
+Without a cascade LR and RF are independent, with BASE_MODEL_PARALLEL=1
+they run concurrently (see baseModelPool.py).
+'''
+
+
+def lr_probabilities(artifacts, batch):
+    if artifacts.fused_lr is not None:
+        with stage("lr"):
+            return artifacts.fused_lr.predict_proba(batch.matrix), None
+    with stage("scale"):
+        X_scaled = scale_features(artifacts.scaler, batch)
+    return _lr_on_scaled(artifacts, X_scaled), X_scaled
+
+
+def _lr_on_scaled(artifacts, X_scaled):
+    with stage("lr"):
+        return artifacts.lr_model.predict_proba(X_scaled)[:, 1]
+
+
+def _rf(artifacts, batch, X_scaled):
+    if X_scaled is None:
+        with stage("scale"):
+            X_scaled = scale_features(artifacts.scaler, batch)
+    with stage("rf"):
+        return forest_predict(artifacts.rf_model, artifacts.rf_forest, X_scaled)
+
+
+def rf_label_dtype(rf_model):
+    classes = getattr(rf_model, "classes_", None)
+    return classes.dtype if classes is not None else np.float64
+
+
+def meta_rf_input(lr_predictions, rf_predictions):
+    # Rows the cascade kept from the RF stage (NaN) stand in with their LR prediction
+    if rf_predictions.dtype.kind != "f":
+        return rf_predictions
+    return np.where(np.isnan(rf_predictions), lr_predictions, rf_predictions)
+
+
+def predict_fraud(artifacts, batch, cascade=None):
+    if cascade is None:
+        if artifacts.fused_lr is not None:
+            # The fused LR reads the raw matrix, the RF scales its own copy meanwhile
+            lr_proba, rf_predictions = run_base_models(
+                lambda: lr_probabilities(artifacts, batch)[0],
+                lambda: _rf(artifacts, batch, None),
+                rows=len(batch.matrix))
+        else:
+            with stage("scale"):
+                X_scaled = scale_features(artifacts.scaler, batch)
+            lr_proba, rf_predictions = run_base_models(
+                lambda: _lr_on_scaled(artifacts, X_scaled),
+                lambda: _rf(artifacts, batch, X_scaled),
+                rows=len(batch.matrix))
+        lr_predictions = (lr_proba > 0.5).astype(int)
+    else:
+        lr_proba, X_scaled = lr_probabilities(artifacts, batch)
+        lr_predictions = (lr_proba > 0.5).astype(int)
+        full = cascade.route(lr_proba)
+        rf_predictions = np.full(len(lr_predictions), np.nan)
+        if full.any():
+            with stage("scale"):
+                X_full = X_scaled[full] if X_scaled is not None else scale_features(artifacts.scaler, batch, rows=full)
+            with stage("rf"):
+                rf_predictions[full] = forest_predict(artifacts.rf_model, artifacts.rf_forest, X_full)
+
+    with stage("meta"):
+        meta_input = np.column_stack([lr_predictions, meta_rf_input(lr_predictions, rf_predictions)])
+        meta_predictions = (artifacts.meta_model.predict(meta_input) < 0.3).astype(int)
+    return lr_predictions, rf_predictions, meta_input, meta_predictions
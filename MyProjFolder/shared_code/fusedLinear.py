@@ -0,0 +1,124 @@
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from shared_code.alignmentPlan import scale_features
+
+'''
+Fused StandardScaler + LogisticRegression scoring.
+
+    w . ((x - mean) / scale) + b  ==  (w / scale) . x + (b - w . (mean / scale))
+
+so the LR probability is one matrix-vector product on the raw aligned
+features and the scaled matrix is only needed by the RF stage.
+
+Enabled with FRAUD_FUSED_LR=1. The fused weights are compiled with every
+artifact set and checked against the unfused path on a synthetic probe;
+if they disagree the registry falls back to scaler + lr_model. Run
+
+    python -m shared_code.fusedLinear <model_dir> <csv>
+
+to compare the fused path with FraudPredictionModels on real rows.
+'''
+
+FUSED_LR_ENABLED = os.getenv("FRAUD_FUSED_LR", "0") == "1"
+
+# Largest accepted probability difference between the fused and the unfused path
+PARITY_TOLERANCE = 1e-9
+
+
+class FusedLinearModel:
+    def __init__(self, weights, intercept):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    def decision_function(self, X):
+        return X @ self.weights + self.intercept
+
+    def predict_proba(self, X):
+        return expit(self.decision_function(X))
+
+
+def fuse_scaler_into_lr(scaler, lr_model):
+    coef = np.asarray(lr_model.coef_, dtype=np.float64)
+    if coef.shape[0] != 1:
+        raise ValueError("only binary logistic regression can be fused")
+
+    weights = coef[0].copy()
+    intercept = float(np.asarray(lr_model.intercept_)[0])
+    if getattr(scaler, "scale_", None) is not None:
+        weights /= scaler.scale_
+    if getattr(scaler, "mean_", None) is not None:
+        intercept -= float(weights @ scaler.mean_)
+    return FusedLinearModel(weights, intercept)
+
+
+def _unfused_proba(scaler, lr_model, X):
+    if hasattr(scaler, "feature_names_in_"):
+        X = pd.DataFrame(X, columns=scaler.feature_names_in_, copy=False)
+    return lr_model.predict_proba(scaler.transform(X))[:, 1]
+
+
+def compile_fused_lr(scaler, lr_model, probe_rows=256):
+    try:
+        fused = fuse_scaler_into_lr(scaler, lr_model)
+    except (AttributeError, ValueError) as e:
+        logging.warning(f"[Fraud] Fused LR unavailable, using scaler + lr_model: {e}")
+        return None
+
+    # Self-check on points spread around the training distribution
+    rng = np.random.default_rng(0)
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    n_features = fused.weights.shape[0]
+    probe = rng.standard_normal((probe_rows, n_features))
+    if scale is not None:
+        probe *= scale
+    if mean is not None:
+        probe += mean
+
+    diff = np.abs(fused.predict_proba(probe) - _unfused_proba(scaler, lr_model, probe)).max()
+    if diff > PARITY_TOLERANCE:
+        logging.warning(f"[Fraud] Fused LR failed its self-check (max diff {diff:.3g}), using scaler + lr_model")
+        return None
+    return fused
+
+
+def parity_report(artifacts, X_test_df):
+    '''Score the same rows through the unfused and the fused LR stage and compare.'''
+    batch = artifacts.alignment_plan.build(X_test_df)
+    fused = fuse_scaler_into_lr(artifacts.scaler, artifacts.lr_model)
+
+    reference = _unfused_proba(artifacts.scaler, artifacts.lr_model, batch.matrix)
+    candidate = fused.predict_proba(batch.matrix)
+
+    ref_lr = (reference > 0.5).astype(int)
+    new_lr = (candidate > 0.5).astype(int)
+    rf_predictions = artifacts.rf_model.predict(scale_features(artifacts.scaler, batch))
+    ref_meta = (artifacts.meta_model.predict(np.column_stack([ref_lr, rf_predictions])) < 0.3).astype(int)
+    new_meta = (artifacts.meta_model.predict(np.column_stack([new_lr, rf_predictions])) < 0.3).astype(int)
+
+    return {
+        "rows": int(len(reference)),
+        "max_probability_diff": float(np.abs(reference - candidate).max()) if len(reference) else 0.0,
+        "lr_mismatches": int((ref_lr != new_lr).sum()),
+        "meta_mismatches": int((ref_meta != new_meta).sum()),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m shared_code.fusedLinear <model_dir> <csv>")
+        sys.exit(1)
+
+    from shared_code.modelRegistry import get_fraud_registry
+
+    artifacts = get_fraud_registry(sys.argv[1]).current()
+    report = parity_report(artifacts, pd.read_csv(sys.argv[2]))
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    sys.exit(0 if report["lr_mismatches"] == 0 and report["meta_mismatches"] == 0 else 1)
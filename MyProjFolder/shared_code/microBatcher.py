@@ -0,0 +1,156 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+'''
+Micro-batcher between a per-event receiver and a batch scorer.
+
+Events are queued by `submit` and collected by one worker thread until
+`max_size` events are waiting or the oldest one has waited `max_wait_ms`,
+whichever comes first. The batch is scored with one call to
+`score_batch(items) -> results` and every result is handed back to its
+event through a Future (and the optional callback). The optional
+`after_batch()` runs once after all callbacks of a batch, e.g. to flush
+what they collected in one go.
+
+The queueing delay of an event is bounded by `max_wait_ms` as long as
+scoring keeps up with the arrival rate. Batch sizes and queueing delays
+are recorded in histograms, see `stats()`.
+'''
+
+_STOP = object()
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+            return {
+                "count": self.total,
+                "mean": self.sum / self.total if self.total else 0.0,
+                "buckets": dict(zip(labels, self.counts)),
+            }
+
+
+class _Pending:
+    def __init__(self, item, callback):
+        self.item = item
+        self.callback = callback
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class MicroBatcher:
+    def __init__(self, score_batch, max_size=256, max_wait_ms=50, name="MicroBatcher", after_batch=None):
+        self.score_batch = score_batch
+        self.after_batch = after_batch
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+
+        size_bounds = [1]
+        while size_bounds[-1] < max_size:
+            size_bounds.append(min(size_bounds[-1] * 2, max_size))
+        self.batch_sizes = Histogram(size_bounds)
+        self.wait_ms = Histogram([1, 2, 5, 10, 20, 50, 100, 200, 500, 1000])
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        '''Score whatever is queued, then stop the worker.'''
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, item, callback=None):
+        pending = _Pending(item, callback)
+        self._queue.put(pending)
+        return pending.future
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "wait_ms": self.wait_ms.snapshot(),
+        }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first.enqueued + self.max_wait
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Past the deadline only what is already queued joins the batch
+                pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            self._dispatch(self._collect(first))
+
+    def _dispatch(self, batch):
+        now = time.monotonic()
+        self.batch_sizes.observe(len(batch))
+        for pending in batch:
+            self.wait_ms.observe((now - pending.enqueued) * 1000.0)
+
+        try:
+            results = self.score_batch([pending.item for pending in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"scorer returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logging.error(f"[{self.name}] Batch of {len(batch)} failed: {e}")
+            for pending in batch:
+                pending.future.set_exception(e)
+        else:
+            for pending, result in zip(batch, results):
+                pending.future.set_result(result)
+
+        for pending in batch:
+            if pending.callback is not None:
+                try:
+                    pending.callback(pending.future)
+                except Exception as e:
+                    logging.error(f"[{self.name}] Callback failed: {e}")
+
+        if self.after_batch is not None:
+            try:
+                self.after_batch()
+            except Exception as e:
+                logging.error(f"[{self.name}] After-batch hook failed: {e}")
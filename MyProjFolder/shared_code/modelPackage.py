@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import sys
+
+import joblib
+
+from shared_code.forestArrays import FOREST_BACKEND, compile_forest, load_forest, save_forest
+
+'''
+Memory-mapped packaging of the tree models.
+
+    python -m shared_code.modelPackage Models/FraudModels Models/ChurnModels
+
+Every <name>.pkl in a model directory that holds a random forest or a
+gradient boosting regressor is exported to <model dir>/packed/<name>/ as
+the flat node arrays of forestArrays.py, one .npy file per array, plus a
+source.json with the size and mtime of the pickle it came from. Other
+pickles (scalers, encoders, linear models) are small and left as they are.
+
+With MODEL_MMAP=1 `load_model` opens the packed arrays with mmap_mode='r'
+instead of unpickling the estimator, so all workers on a host share one
+page-cache copy of the trees instead of holding one private copy each. A
+packed model is only used while source.json still matches its pickle; after
+the pickle is replaced, run the packaging step again (until then the pickle
+is loaded as before).
+
+The trade-off is speed: a memory-mapped model is a ForestArrays, so every
+predict runs on the level-by-level NumPy evaluator whatever FOREST_BACKEND
+says. On large batches of deep trees that evaluator is several times
+slower than sklearn (a 100-tree RF on 100k rows: 1.4s with sklearn, 5.2s
+memory-mapped). sklearn estimators cannot be rebuilt on top of the mapped
+arrays, their trees copy the nodes into private memory, which is what
+MODEL_MMAP avoids. `load_model` logs a warning for every memory-mapped
+model unless FOREST_BACKEND=numpy already asks for that evaluator. Use
+MODEL_MMAP=1 where memory per worker matters more than batch latency
+(many workers, small batches).
+
+See benchmarks/modelMemoryBenchmark.py for the per-worker memory and
+benchmarks/forestBenchmark.py for the speed of both evaluators.
+'''
+
+MODEL_MMAP = os.getenv("MODEL_MMAP", "0") == "1"
+PACKED_DIR = "packed"
+
+
+def packed_path(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), PACKED_DIR, name)
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return {"file": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def package_model(path, label="Model"):
+    '''Export one pickled tree model, returns the packed directory or None if it is not a tree model.'''
+    model = joblib.load(path)
+    if not hasattr(model, "estimators_"):
+        return None
+
+    # Same self-check as the in-process evaluator, a packed model must predict exactly like the pickle
+    forest = compile_forest(model, label)
+    if forest is None:
+        return None
+
+    directory = packed_path(path)
+    save_forest(forest, directory)
+    with open(os.path.join(directory, "source.json"), "w") as f:
+        json.dump(source_stamp(path), f)
+    return directory
+
+
+def package_dir(model_dir, label="Model"):
+    packed = []
+    for filename in sorted(os.listdir(model_dir)):
+        if not filename.endswith(".pkl"):
+            continue
+        directory = package_model(os.path.join(model_dir, filename), label)
+        if directory is None:
+            print(f"[{label}] {filename}: not a tree model, kept as pickle")
+            continue
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        print(f"[{label}] {filename}: packed into {directory} ({size / 2**20:.1f} MiB)")
+        packed.append(directory)
+    return packed
+
+
+def packed_stamp_path(path):
+    return os.path.join(packed_path(path), "source.json")
+
+
+def load_packed(path, label="Model"):
+    stamp_path = packed_stamp_path(path)
+    if not os.path.exists(stamp_path):
+        return None
+    with open(stamp_path) as f:
+        stamp = json.load(f)
+    if stamp != source_stamp(path):
+        logging.warning(f"[{label}] {packed_path(path)} is older than {os.path.basename(path)}, loading the pickle")
+        return None
+    return load_forest(packed_path(path), mmap_mode="r")
+
+
+def load_model(path, label="Model", mmap=None):
+    mmap = MODEL_MMAP if mmap is None else mmap
+    if mmap and path.endswith(".pkl"):
+        forest = load_packed(path, label)
+        if forest is not None:
+            if FOREST_BACKEND != "numpy":
+                logging.warning(f"[{label}] {os.path.basename(path)} is memory-mapped (MODEL_MMAP=1): it predicts with the "
+                                f"NumPy evaluator, not FOREST_BACKEND={FOREST_BACKEND}, several times slower than "
+                                f"sklearn on large batches")
+            return forest
+    return joblib.load(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python -m shared_code.modelPackage <model_dir> [<model_dir> ...]")
+        sys.exit(2)
+    for model_dir in sys.argv[1:]:
+        label = os.path.basename(os.path.normpath(model_dir)).replace("Models", "") or "Model"
+        package_dir(model_dir, label)
@@ -0,0 +1,218 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from shared_code.alignmentPlan import AlignmentPlan
+from shared_code.categoricalTables import compile_encoding_tables
+from shared_code.churnOneHot import ChurnOneHotEncoder
+from shared_code.forestArrays import compile_forest, forest_enabled
+from shared_code.fusedLinear import FUSED_LR_ENABLED, compile_fused_lr
+from shared_code.modelPackage import MODEL_MMAP, load_model, packed_stamp_path
+
+'''
+Process-wide model registry.
+
+1. loads every artifact of a model set once per process
+2. shares the loaded set across invocations (timer ticks, events, requests)
+3. fingerprints the files on disk (name, size, mtime) as the set version
+4. reloads on the next call after the fingerprint changes and swaps the
+   whole set in with one assignment
+5. runs an optional compile step on every freshly loaded set, so derived
+   lookup structures are built once and versioned with their sources
+
+Nothing is loaded before the first `current()`. The files of a set are
+unpickled on MODEL_LOAD_THREADS threads (file reads and the copies of
+large arrays run without the GIL), and files named in `optional` may be
+missing, they are then loaded as None. Two threads unpickling into the
+same not yet imported modules can trip the import system's deadlock
+detection; such a file is loaded again on the calling thread once the
+others are done.
+
+Callers take one snapshot with `current()` per batch and use only that
+snapshot, so a batch never mixes artifacts from two versions.
+'''
+
+FRAUD_MODEL_FILES = {
+    "scaler": "scaler.pkl",
+    "label_encoders": "label_encoder.pkl",
+    "columns": "x_column_names.npy",
+    "lr_model": "lr_model.pkl",
+    "rf_model": "rf_model.pkl",
+    "meta_model": "meta_model.pkl",
+}
+
+CHURN_MODEL_FILES = {
+    "gbr_model": "gbr_model.pkl",
+    "rf_model": "rf_model.pkl",
+    "meta_model": "meta_model.pkl",
+    "label_encoders": "label_encoders.pkl",
+    "scaler": "scaler.pkl",
+    "columns": "X_train_columns.npy",
+    "preprocessor": "preprocessor.pkl",
+}
+
+# Fitted with python -m shared_code.churnPreprocessing, without it every batch is fitted on itself
+CHURN_OPTIONAL_FILES = ("preprocessor",)
+
+# Seconds between two fingerprint checks of the files on disk
+RELOAD_CHECK_INTERVAL = float(os.getenv("MODEL_RELOAD_CHECK_INTERVAL", "5"))
+MODEL_LOAD_THREADS = int(os.getenv("MODEL_LOAD_THREADS", "4"))
+
+
+class ModelArtifacts:
+    def __init__(self, model_dir, version, objects):
+        self.model_dir = model_dir
+        self.version = version
+        self.loaded_at = time.time()
+        for name, obj in objects.items():
+            setattr(self, name, obj)
+
+
+def _load_file(path, label="Model"):
+    if path.endswith(".npy"):
+        return np.load(path, allow_pickle=True).tolist()
+    # Packed tree models are memory-mapped with MODEL_MMAP=1, see modelPackage.py
+    return load_model(path, label)
+
+
+def compile_fraud_artifacts(objects):
+    objects["encoding_tables"] = compile_encoding_tables(objects["label_encoders"])
+    objects["alignment_plan"] = AlignmentPlan(objects["columns"], objects["encoding_tables"])
+    objects["fused_lr"] = compile_fused_lr(objects["scaler"], objects["lr_model"]) if FUSED_LR_ENABLED else None
+    objects["rf_forest"] = compile_forest(objects["rf_model"], "Fraud") if forest_enabled() else None
+
+
+def compile_churn_artifacts(objects):
+    objects["one_hot"] = ChurnOneHotEncoder(objects["columns"], objects["label_encoders"])
+    objects["rf_forest"] = compile_forest(objects["rf_model"], "Churn") if forest_enabled() else None
+
+
+def fingerprint(model_dir, files, optional=()):
+    digest = hashlib.sha1()
+    for name in sorted(files):
+        path = os.path.join(model_dir, files[name])
+        if name in optional and not os.path.exists(path):
+            digest.update(f"{files[name]}:missing;".encode())
+            continue
+        stat = os.stat(path)
+        digest.update(f"{files[name]}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        # Re-packaging a model is a new version too
+        if MODEL_MMAP and os.path.exists(packed_stamp_path(path)):
+            stat = os.stat(packed_stamp_path(path))
+            digest.update(f"packed:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def _is_import_deadlock(e):
+    # importlib's _DeadlockError, a RuntimeError subclass that is not exported
+    return isinstance(e, RuntimeError) and type(e).__name__ == "_DeadlockError"
+
+
+def load_artifacts(model_dir, files, label="Model", optional=(), threads=MODEL_LOAD_THREADS):
+    def load(name):
+        path = os.path.join(model_dir, files[name])
+        if name in optional and not os.path.exists(path):
+            logging.warning(f"[{label}] {files[name]} not found, continuing without it")
+            return None
+        try:
+            return _load_file(path, label)
+        except Exception as e:
+            if not _is_import_deadlock(e):
+                logging.error(f"[{label}] Failed to load {files[name]}: {e}")
+            raise
+
+    if threads <= 1 or len(files) <= 1:
+        return {name: load(name) for name in files}
+
+    with ThreadPoolExecutor(max_workers=min(threads, len(files)), thread_name_prefix="model-load") as pool:
+        futures = {name: pool.submit(load, name) for name in files}
+    loaded = {}
+    for name, future in futures.items():
+        try:
+            loaded[name] = future.result()
+        except Exception as e:
+            if not _is_import_deadlock(e):
+                raise
+            # The modules the other threads were importing are complete now
+            logging.info(f"[{label}] Import deadlock while loading {files[name]}, loading it again")
+            loaded[name] = load(name)
+    return loaded
+
+
+class ModelRegistry:
+    def __init__(self, model_dir, files, label="Model", compile=None, check_interval=RELOAD_CHECK_INTERVAL, optional=()):
+        self.model_dir = model_dir
+        self.files = files
+        self.optional = optional
+        self.label = label
+        self.compile = compile
+        self.check_interval = check_interval
+        self._artifacts = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._artifacts.version if self._artifacts is not None else None
+
+    def current(self):
+        artifacts = self._artifacts
+        if artifacts is not None and time.monotonic() - self._last_check < self.check_interval:
+            return artifacts
+
+        with self._lock:
+            if self._artifacts is None or time.monotonic() - self._last_check >= self.check_interval:
+                self._refresh()
+            return self._artifacts
+
+    def _refresh(self):
+        self._last_check = time.monotonic()
+        try:
+            version = fingerprint(self.model_dir, self.files, self.optional)
+            if self._artifacts is not None and version == self._artifacts.version:
+                return
+
+            objects = load_artifacts(self.model_dir, self.files, self.label, self.optional)
+            if self.compile is not None:
+                self.compile(objects)
+
+            # Files still being copied: keep the old set and retry on the next check
+            if fingerprint(self.model_dir, self.files, self.optional) != version:
+                raise RuntimeError("artifacts changed while loading")
+        except Exception as e:
+            if self._artifacts is None:
+                raise
+            logging.error(f"[{self.label}] Reload failed, keeping version {self._artifacts.version}: {e}")
+            return
+
+        previous = self.version
+        self._artifacts = ModelArtifacts(self.model_dir, version, objects)
+        if previous is None:
+            logging.info(f"[{self.label}] Loaded model artifacts version {version} from {self.model_dir}")
+        else:
+            logging.info(f"[{self.label}] Swapped model artifacts {previous} -> {version}")
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(model_dir, files, label="Model", compile=None, optional=()):
+    key = (os.path.abspath(model_dir), label)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = ModelRegistry(model_dir, files, label, compile, optional=optional)
+        return _registries[key]
+
+
+def get_fraud_registry(model_dir="Models/FraudModels"):
+    return get_registry(model_dir, FRAUD_MODEL_FILES, "Fraud", compile_fraud_artifacts)
+
+
+def get_churn_registry(model_dir="Models/ChurnModels"):
+    return get_registry(model_dir, CHURN_MODEL_FILES, "Churn", compile_churn_artifacts, CHURN_OPTIONAL_FILES)
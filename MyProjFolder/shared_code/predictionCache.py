@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+'''
+Transaction-level cache of fraud verdicts.
+
+Event Hub redelivers events after a consumer restart and FraudTable gets
+re-submitted transactions, so the same row is often scored more than once.
+The cache maps
+
+    (TransactionID, hash of the row's values and column names) -> (LR, RF, Meta)
+
+for the model version it was filled with. It is an LRU bounded by
+FRAUD_CACHE_SIZE entries (0 disables it) whose entries expire after
+FRAUD_CACHE_TTL seconds, and it is emptied as soon as the registry reports
+a different model version. `stats()` gives the hit/miss/eviction counters.
+'''
+
+CACHE_SIZE = int(os.getenv("FRAUD_CACHE_SIZE", "100000"))
+CACHE_TTL = float(os.getenv("FRAUD_CACHE_TTL", "3600"))
+
+
+def row_keys(df, id_column="TransactionID"):
+    '''One hashable key per row, or None when the rows have no TransactionID.'''
+    if id_column not in df.columns:
+        return None
+    # Same values under other column names must not collide
+    layout = hash(tuple(df.columns))
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return [(tx_id, int(h), layout) for tx_id, h in zip(df[id_column].tolist(), hashes)]
+
+
+class PredictionCache:
+    def __init__(self, max_entries=CACHE_SIZE, ttl_seconds=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def bind_version(self, version):
+        '''Drop every entry when the model version changed since the last call.'''
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] < now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    values.append(entry[0])
+        return values
+
+    def put_many(self, keys, values, version):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            # Scored with a set that has since been replaced, do not mix versions
+            if version != self.version:
+                return
+            for key, value in zip(keys, values):
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
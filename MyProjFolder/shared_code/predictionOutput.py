@@ -0,0 +1,168 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+
+'''
+Writers for scored fraud batches.
+
+`csv` keeps the historical predictions_output.csv layout. `parquet` writes
+compact dtypes (int8 predictions, float32 features, TransactionID as is;
+an RF prediction the cascade skipped is a null)
+and, per written batch, one row group with the Meta_Prediction = 0 rows and
+one with the Meta_Prediction = 1 rows. The row-group min/max statistics
+then let a reader skip every non-fraud group, e.g.
+
+    pq.read_table(path, filters=[("Meta_Prediction", "=", 1)])
+
+Rows keep their input order within each row group. With `ids_only` only
+TransactionID and the three prediction columns are written.
+
+The parquet schema does not depend on what a batch happens to hold (a
+column that is all NULL in one batch would otherwise be typed `null` and
+the next batch with values in it could not be written): predictions are
+int8, the `string_columns` given by the caller (the label-encoded columns
+of the models) are strings and every other feature column is float32.
+Only the TransactionID type is taken from the first batch. Without any
+batch the file still holds an empty table with TransactionID and the
+predictions.
+
+pyarrow is only imported when the parquet format is used.
+'''
+
+PREDICTION_COLUMNS = ["LR_Prediction", "RF_Prediction", "Meta_Prediction"]
+ID_COLUMN = "TransactionID"
+FORMATS = ("csv", "parquet")
+
+
+def select_columns(df, ids_only):
+    if not ids_only:
+        return df
+    return df[[ID_COLUMN] + PREDICTION_COLUMNS]
+
+
+def compact_frame(df, string_columns=()):
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if col in PREDICTION_COLUMNS:
+            df[col] = df[col].astype(np.int8 if df[col].notna().all() else "Int8")
+        elif col in string_columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str)).astype(object)
+        elif col != ID_COLUMN:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
+    return df
+
+
+def empty_schema():
+    import pyarrow as pa
+
+    return pa.schema([(ID_COLUMN, pa.int64())] + [(col, pa.int8()) for col in PREDICTION_COLUMNS])
+
+
+def write_empty(path, schema):
+    import pyarrow.parquet as pq
+
+    pq.write_table(schema.empty_table(), path, compression="snappy")
+
+
+class CsvPredictionWriter:
+    def __init__(self, path, ids_only=False, header=True, string_columns=()):
+        self.path = path
+        self.ids_only = ids_only
+        self._header = header
+        self._file = open(path, "w", newline="")
+
+    def write(self, df):
+        select_columns(df, self.ids_only).to_csv(self._file, header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetPredictionWriter:
+    def __init__(self, path, ids_only=False, header=True, string_columns=()):
+        import pyarrow  # noqa: F401, fail early when the optional dependency is missing
+
+        self.path = path
+        self.ids_only = ids_only
+        self.string_columns = set(string_columns or ())
+        self._writer = None
+        self._schema = None
+
+    def schema_of(self, df):
+        import pyarrow as pa
+
+        fields = []
+        for col in df.columns:
+            if col in PREDICTION_COLUMNS:
+                fields.append((col, pa.int8()))
+            elif col == ID_COLUMN:
+                id_type = pa.Schema.from_pandas(df[[col]], preserve_index=False).field(col).type
+                fields.append((col, pa.string() if pa.types.is_null(id_type) else id_type))
+            elif col in self.string_columns:
+                fields.append((col, pa.string()))
+            else:
+                fields.append((col, pa.float32()))
+        return pa.schema(fields)
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        df = compact_frame(select_columns(df, self.ids_only), self.string_columns)
+        if self._writer is None:
+            self._schema = self.schema_of(df)
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression="snappy", write_statistics=True)
+
+        flagged = df["Meta_Prediction"].to_numpy() == 1
+        for rows in (~flagged, flagged):
+            if rows.any():
+                table = pa.Table.from_pandas(df[rows], schema=self._schema, preserve_index=False)
+                self._writer.write_table(table, row_group_size=len(table))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            # Nothing was scored, still leave a readable (empty) file behind
+            write_empty(self.path, empty_schema())
+
+
+def open_writer(path, fmt="csv", ids_only=False, header=True, string_columns=()):
+    if fmt == "csv":
+        return CsvPredictionWriter(path, ids_only, header, string_columns)
+    if fmt == "parquet":
+        return ParquetPredictionWriter(path, ids_only, header, string_columns)
+    raise ValueError(f"unknown output format '{fmt}', expected one of {FORMATS}")
+
+
+def append_part(part_path, out_path, fmt, state):
+    '''Append one part file written by `open_writer` to the final output, parts in order.'''
+    if fmt == "csv":
+        if "file" not in state:
+            state["file"] = open(out_path, "wb")
+        with open(part_path, "rb") as part:
+            shutil.copyfileobj(part, state["file"], 1 << 20)
+    else:
+        import pyarrow.parquet as pq
+
+        part = pq.ParquetFile(part_path)
+        if part.metadata.num_rows == 0:
+            return
+        if "writer" not in state:
+            state["writer"] = pq.ParquetWriter(out_path, part.schema_arrow, compression="snappy", write_statistics=True)
+        for i in range(part.num_row_groups):
+            group = part.read_row_group(i)
+            state["writer"].write_table(group, row_group_size=max(1, group.num_rows))
+
+
+def close_parts(out_path, fmt, state):
+    if "file" in state:
+        state["file"].close()
+    elif "writer" in state:
+        state["writer"].close()
+    elif fmt == "csv":
+        open(out_path, "wb").close()
+    else:
+        write_empty(out_path, empty_schema())
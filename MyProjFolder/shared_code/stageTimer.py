@@ -0,0 +1,120 @@
+import contextvars
+import json
+import logging
+import os
+import time
+
+'''
+Per-stage timing of scoring runs.
+
+A run (one timer invocation, one micro-batch, one CLI call) is opened with
+
+    with timed_run("FraudTimerTrigger") as run:
+        with stage("fetch"):
+            ...
+        run.set(rows=len(df))
+
+and code anywhere below it, in the same thread, marks its stages with
+`with stage("rf"):`. Stages that run several times in a run add up. When
+the run ends, one structured log line is written,
+
+    [FraudTimerTrigger] stage timings {"run": ..., "total_ms": ..., "stages_ms": {...}, "counts": {...}, ...}
+
+and the same dict is passed to every hook registered with
+`add_timing_hook`, e.g. to forward it to a metrics system.
+
+Timing is off unless STAGE_TIMING=1. When it is off, `timed_run` and
+`stage` return a shared no-op context manager, so an instrumented stage
+costs one function call.
+'''
+
+TIMING_ENABLED = os.getenv("STAGE_TIMING", "0") == "1"
+
+_current = contextvars.ContextVar("stage_timer_run", default=None)
+_hooks = []
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.run.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class RunTimer:
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.counts = {}
+        self.fields = {}
+
+    def add(self, stage_name, seconds):
+        self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+        self.counts[stage_name] = self.counts.get(stage_name, 0) + 1
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        record = {
+            "run": self.name,
+            "started_at": self.started_at,
+            "total_ms": (time.perf_counter() - self.start) * 1000.0,
+            "stages_ms": {name: seconds * 1000.0 for name, seconds in self.stages.items()},
+            "counts": self.counts,
+            "failed": exc_type is not None,
+            **self.fields,
+        }
+        logging.info(f"[{self.name}] stage timings {json.dumps(record, default=str)}")
+        for hook in list(_hooks):
+            try:
+                hook(record)
+            except Exception as e:
+                logging.error(f"[{self.name}] Timing hook failed: {e}")
+        return False
+
+
+def timed_run(name):
+    return RunTimer(name) if TIMING_ENABLED else _NULL
+
+
+def stage(name):
+    run = _current.get() if TIMING_ENABLED else None
+    return _Span(run, name) if run is not None else _NULL
+
+
+def add_timing_hook(hook):
+    '''Call `hook(record)` with the timing record of every finished run.'''
+    _hooks.append(hook)
+
+
+def remove_timing_hook(hook):
+    _hooks.remove(hook)
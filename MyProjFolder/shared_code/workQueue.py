@@ -0,0 +1,231 @@
+import logging
+import os
+import time
+import uuid
+
+import pandas as pd
+
+from shared_code.stageTimer import stage
+
+'''
+Claiming unprocessed rows, so several trigger runs or scaled-out instances
+can drain one table in parallel without scoring a row twice.
+
+Each batch is claimed with one statement that marks and returns its rows:
+
+    WITH batch AS (
+        SELECT TOP (?) * FROM FraudTable WITH (READPAST, UPDLOCK, ROWLOCK)
+        WHERE Processed = 0 AND (ClaimToken IS NULL OR ClaimExpiresAt < SYSUTCDATETIME())
+        ORDER BY TransactionID
+    )
+    UPDATE batch SET ClaimToken = ?, ClaimExpiresAt = DATEADD(SECOND, ?, SYSUTCDATETIME()),
+                     ClaimAttempts = ClaimAttempts + 1
+    OUTPUT deleted.ClaimToken, inserted.ClaimAttempts, inserted.[TransactionID], ...
+
+1. UPDLOCK keeps two instances from claiming the same row, READPAST makes
+   an instance skip rows another one is claiming instead of waiting
+2. the claim is committed at once; the rows then carry a new token and a
+   lease of CLAIM_LEASE_S seconds (300, the default Functions timeout)
+3. the write-back only updates rows still holding the batch's token and
+   clears the claim with Processed = 1; a batch that outlived its lease
+   writes nothing for rows another instance has reclaimed meanwhile
+4. rows whose lease expired (a crashed or timed-out instance, a failed
+   batch) are claimed again by the next run, oldest key first
+5. every claim counts an attempt; a row claimed for more than
+   CLAIM_MAX_ATTEMPTS times is parked instead of returned: it keeps the
+   claim with a lease that never expires (ClaimExpiresAt = 9999-12-31),
+   so a row that always fails no longer fails its batch on every lease
+   expiry and no longer holds up the rows after it. Parked rows are
+   logged and stay unprocessed for inspection; once fixed, requeue them:
+
+    UPDATE FraudTable SET ClaimToken = NULL, ClaimExpiresAt = NULL, ClaimAttempts = 0
+    WHERE Processed = 0 AND ClaimExpiresAt = '9999-12-31'
+
+A failed batch counts an attempt for each of its rows, the good ones
+included. So `drain` processes a batch that holds rows claimed before in
+halves when it fails, down to the rows that fail on their own; the rest is
+written back and only the bad rows use up their attempts. When both halves
+fail the cause is not a row (the database, the models) and the error is
+raised as before.
+
+The claim columns and a filtered index on the unprocessed rows are created
+by uploadingTable/fraudTables/addingFraud.py and
+uploadingTable/churnTables/addingChrunCol.py ("add" or "claims"; tables
+that already have the claim columns get ClaimAttempts with "attempts").
+
+The claimed rows are read with fetchmany in chunks of FETCH_ARRAYSIZE
+rows, each turned into a DataFrame before the next is read, so a batch is
+never held as Python row tuples all at once (a row of floats takes several
+times the memory of its DataFrame columns). With the batch size itself
+capped by the RSS budget of batchSizer.py, peak memory does not grow with
+the backlog.
+
+`drain` is the loop both timer triggers run on top of this: ask the
+AdaptiveBatchSizer (batchSizer.py) for a size, claim, process and measure
+one batch, until a batch comes back short or the time budget is spent.
+Its `prepare` step (the model registry snapshot) runs before the measured
+window, so a lazy model load or reload never counts as batch time, and the
+first batch of an invocation is not capped by the time left: a slow rate
+saved by an earlier run cannot stop every later run before its first row.
+'''
+
+LEASE_SECONDS = int(os.getenv("CLAIM_LEASE_S", "300"))
+FETCH_ARRAYSIZE = int(os.getenv("FETCH_ARRAYSIZE", "1000"))
+MAX_ATTEMPTS = int(os.getenv("CLAIM_MAX_ATTEMPTS", "3"))
+
+TOKEN_COLUMN = "ClaimToken"
+EXPIRES_COLUMN = "ClaimExpiresAt"
+ATTEMPTS_COLUMN = "ClaimAttempts"
+PREVIOUS_CLAIM = "PreviousClaimToken"
+PARKED_UNTIL = "9999-12-31"
+# DataFrame.attrs keys of a claimed batch: rows claimed (parked ones included), rows claimed before
+CLAIMED_ROWS = "claimed_rows"
+RETRIED_ROWS = "retried_rows"
+
+
+def fetch_frame(cursor, arraysize=None):
+    '''Read the pending result set of `cursor` into a DataFrame, fetchmany chunk by chunk.'''
+    cursor.arraysize = arraysize or FETCH_ARRAYSIZE
+    columns = [col[0] for col in cursor.description]
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(cursor.arraysize)
+        if not rows:
+            break
+        chunks.append(pd.DataFrame.from_records(rows, columns=columns))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    if len(chunks) == 1:
+        return chunks[0]
+
+    df = pd.concat(chunks, ignore_index=True)
+    # A chunk with only NULLs in a column infers object; infer again where chunks disagree, as one
+    # from_records over all rows would have
+    mixed = [col for col in columns if len({chunk[col].dtype for chunk in chunks}) > 1]
+    if mixed:
+        df[mixed] = df[mixed].infer_objects()
+    return df
+
+
+class WorkQueue:
+    def __init__(self, table, key, label="Model", lease_seconds=None, max_attempts=None):
+        self.table = table
+        self.key = key
+        self.label = label
+        self.lease_seconds = LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.max_attempts = MAX_ATTEMPTS if max_attempts is None else max_attempts
+
+    def claim(self, conn, cursor, output_list, size):
+        '''Claim up to `size` unprocessed rows; returns the claim token and the rows (the `output_list` columns).'''
+        token = str(uuid.uuid4())
+        cursor.execute(f"""
+            WITH batch AS (
+                SELECT TOP (?) * FROM {self.table} WITH (READPAST, UPDLOCK, ROWLOCK)
+                WHERE Processed = 0 AND ({TOKEN_COLUMN} IS NULL OR {EXPIRES_COLUMN} < SYSUTCDATETIME())
+                ORDER BY {self.key}
+            )
+            UPDATE batch SET {TOKEN_COLUMN} = ?, {EXPIRES_COLUMN} = DATEADD(SECOND, ?, SYSUTCDATETIME()),
+                             {ATTEMPTS_COLUMN} = {ATTEMPTS_COLUMN} + 1
+            OUTPUT deleted.{TOKEN_COLUMN} AS {PREVIOUS_CLAIM}, inserted.{ATTEMPTS_COLUMN} AS {ATTEMPTS_COLUMN}, {output_list}
+        """, size, token, self.lease_seconds)
+        df = fetch_frame(cursor)
+        claimed = len(df)
+
+        attempts = df.pop(ATTEMPTS_COLUMN) if ATTEMPTS_COLUMN in df.columns else None
+        if attempts is not None and (attempts > self.max_attempts).any():
+            poison = (attempts > self.max_attempts).to_numpy()
+            self._park(cursor, token, df.loc[poison, self.key])
+            df = df.loc[~poison].reset_index(drop=True)
+        # Committed at once, other instances skip these rows from now on
+        conn.commit()
+
+        reclaimed = int(df.pop(PREVIOUS_CLAIM).notna().sum()) if PREVIOUS_CLAIM in df.columns else 0
+        if reclaimed:
+            logging.warning(f"[{self.label}] Reclaimed {reclaimed} rows of {self.table} whose lease expired.")
+        df.attrs[CLAIMED_ROWS] = claimed
+        df.attrs[RETRIED_ROWS] = int((attempts[attempts <= self.max_attempts] > 1).sum()) if attempts is not None else 0
+        return token, df
+
+    def _park(self, cursor, token, keys):
+        # Parked under this claim for good, see 5. above
+        cursor.execute(f"""
+            UPDATE {self.table} SET {EXPIRES_COLUMN} = ?
+            WHERE {TOKEN_COLUMN} = ? AND {ATTEMPTS_COLUMN} > ?
+        """, PARKED_UNTIL, token, self.max_attempts)
+        shown = ", ".join(str(key) for key in keys[:20]) + (", ..." if len(keys) > 20 else "")
+        logging.error(f"[{self.label}] Parked {len(keys)} rows of {self.table} claimed more than {self.max_attempts} "
+                      f"times, they are not claimed again until requeued: {self.key} {shown}")
+
+    def claimed_by(self, token):
+        # Write-back filter: only rows still holding this claim
+        return (TOKEN_COLUMN, token)
+
+    def done(self):
+        # Write-back constants: processed, claim released
+        return {"Processed": 1, TOKEN_COLUMN: "NULL", EXPIRES_COLUMN: "NULL"}
+
+    def drain(self, conn, cursor, claim, process, sizer, time_budget_s, started=None, prepare=None):
+        '''Claim and process batches until none are left or `time_budget_s` is spent.
+
+        `claim(conn, cursor, size)` returns (claim token, rows) like `claim`,
+        `process(conn, cursor, df, token)` scores and writes back one batch,
+        `prepare()` runs before each batch, outside its measurement.
+        Returns {"rows", "batches", "budget_reached"}.
+        '''
+        started = time.perf_counter() if started is None else started
+        stats = {"rows": 0, "batches": 0, "budget_reached": False}
+        while True:
+            if prepare is not None:
+                prepare()
+            # The first batch always runs, it also renews the rate the next sizes are based on
+            seconds_left = time_budget_s - (time.perf_counter() - started) if stats["batches"] else None
+            size = sizer.next_size(seconds_left)
+            if size == 0:
+                logging.info(f"[{self.label}] Time budget of {time_budget_s:.0f}s reached after {stats['batches']} batches.")
+                stats["budget_reached"] = True
+                break
+
+            with sizer.measure() as batch:
+                with stage("fetch"):
+                    token, df = claim(conn, cursor, size)
+                # Parked rows count as claimed: a batch of only parked rows is not the end of the backlog
+                claimed = df.attrs.get(CLAIMED_ROWS, len(df))
+                if claimed == 0:
+                    break
+                if df.attrs.get(RETRIED_ROWS):
+                    processed = self._process_isolating(conn, cursor, process, df, token)
+                elif not df.empty:
+                    process(conn, cursor, df, token)
+                    processed = len(df)
+                else:
+                    processed = 0
+                batch.rows = processed
+
+            stats["rows"] += processed
+            stats["batches"] += 1
+            logging.info(f"[{self.label}] Batch {stats['batches']}: {processed} rows committed, {stats['rows']} so far.")
+
+            # A short batch: nothing left that is not claimed by another run
+            if claimed < size:
+                break
+        return stats
+
+    def _process_isolating(self, conn, cursor, process, df, token):
+        # A failing batch is processed in halves, see the module docstring; returns the rows written back
+        try:
+            process(conn, cursor, df.copy(), token)
+            return len(df)
+        except Exception as e:
+            # Nothing of the failed part stays pending on the connection
+            conn.rollback()
+            if len(df) == 1:
+                logging.error(f"[{self.label}] {self.key} {df[self.key].iloc[0]} failed again, it keeps its claim "
+                              f"until the lease expires: {e}")
+                return 0
+            error = e
+
+        half = len(df) // 2
+        processed = [self._process_isolating(conn, cursor, process, part, token) for part in (df.iloc[:half], df.iloc[half:])]
+        if not any(processed):
+            raise error
+        return sum(processed)
@@ -0,0 +1,31 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from benchmarks.fraudWorkload import load_schema, make_dummy_models
+
+'''
+Small dummy fraud models (see benchmarks/fraudWorkload.py) shared by the
+tests. One encoded column, card4, has whole-number classes ("1", "2",
+"3") the way numeric categoricals come out of the training exports.
+'''
+
+NUMERIC_CATEGORICAL = "card4"
+
+
+@pytest.fixture(scope="session")
+def fraud_models(tmp_path_factory):
+    model_dir = str(tmp_path_factory.mktemp("FraudModels"))
+    # A high fraud rate, so LR, RF and the meta model all give both labels on small samples
+    make_dummy_models(model_dir, train_rows=2_000, n_trees=5, max_depth=6, fraud_rate=0.3)
+
+    label_encoders = joblib.load(f"{model_dir}/label_encoder.pkl")
+    label_encoders[NUMERIC_CATEGORICAL] = LabelEncoder().fit(np.array(["1", "2", "3"]))
+    joblib.dump(label_encoders, f"{model_dir}/label_encoder.pkl")
+    return model_dir
+
+
+@pytest.fixture(scope="session")
+def fraud_schema(fraud_models):
+    return load_schema(fraud_models)
@@ -0,0 +1,65 @@
+from shared_code.eventCheckpoints import EventCheckpoints
+
+
+class Partition:
+    def __init__(self, partition_id="0"):
+        self.partition_id = partition_id
+        self.checkpoints = []
+
+    def update_checkpoint(self, event):
+        self.checkpoints.append(event.sequence_number)
+
+
+class Event:
+    def __init__(self, sequence_number):
+        self.sequence_number = sequence_number
+
+
+def test_checkpoint_waits_for_retry_then_moves_past():
+    checkpoints = EventCheckpoints(max_attempts=3)
+    partition = Partition()
+    events = [Event(n) for n in range(5)]
+
+    checkpoints.succeeded(partition, events[0])
+    assert checkpoints.failed(partition, events[1], ValueError("bad"))
+    for event in events[2:]:
+        checkpoints.succeeded(partition, event)
+    checkpoints.flush()
+    # Not past the event being retried
+    assert partition.checkpoints == [0]
+
+    checkpoints.succeeded(partition, events[1])
+    checkpoints.flush()
+    assert partition.checkpoints == [0, 4]
+
+
+def test_dead_lettered_event_no_longer_pins_partition():
+    dead = []
+    checkpoints = EventCheckpoints(max_attempts=2, dead_letter=lambda ctx, event, error: dead.append(event.sequence_number))
+    partition = Partition()
+
+    assert checkpoints.failed(partition, Event(7), ValueError("bad"))
+    checkpoints.succeeded(partition, Event(8))
+    checkpoints.flush()
+    assert partition.checkpoints == []
+
+    assert not checkpoints.failed(partition, Event(7), ValueError("bad"))
+    assert dead == [7] and checkpoints.dead_lettered == 1
+    checkpoints.flush()
+    assert partition.checkpoints == [8]
+
+    # Later events of the partition move the checkpoint as usual
+    checkpoints.succeeded(partition, Event(9))
+    checkpoints.flush()
+    assert partition.checkpoints == [8, 9]
+
+
+def test_partitions_are_independent():
+    checkpoints = EventCheckpoints(max_attempts=3)
+    first, second = Partition("0"), Partition("1")
+
+    checkpoints.failed(first, Event(3))
+    checkpoints.succeeded(first, Event(4))
+    checkpoints.succeeded(second, Event(3))
+    checkpoints.flush()
+    assert first.checkpoints == [] and second.checkpoints == [3]
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from benchmarks.fraudWorkload import synthetic_batch
+from shared_code.cascadeScoring import Cascade
+from shared_code.fraudEngine import FraudEngine
+from shared_code.predictionOutput import compact_frame
+
+'''
+Rows the LR confidence cascade keeps from the forest have no RF
+prediction (NaN), the rows it sends through the forest keep theirs.
+'''
+
+
+@pytest.fixture(scope="module")
+def sample(fraud_schema):
+    return synthetic_batch(*fraud_schema, rows=500, seed=11, first_id=2_987_000)
+
+
+@pytest.fixture(scope="module")
+def scored(fraud_models, sample):
+    full = FraudEngine(fraud_models).score(sample.copy())
+    cascaded = FraudEngine(fraud_models, Cascade(0.2, 0.8)).score(sample.copy())
+    return full, cascaded
+
+
+def test_skipped_rows_have_no_rf_prediction(scored):
+    full, cascaded = scored
+    skipped = np.isnan(cascaded.rf_predictions)
+    # Both paths taken, or the test proves little
+    assert 0 < skipped.sum() < len(cascaded)
+
+    np.testing.assert_array_equal(cascaded.rf_predictions[~skipped], full.rf_predictions[~skipped])
+    # The meta model still took the LR prediction of a skipped row as its RF input
+    np.testing.assert_array_equal(cascaded.meta_input[skipped, 1], cascaded.lr_predictions[skipped])
+    assert all(record["RF_Prediction"] is None for record, skip in zip(cascaded.records(), skipped) if skip)
+
+
+def test_skipped_rows_are_null_in_parquet_layout(scored):
+    _, cascaded = scored
+    frame = compact_frame(cascaded.to_frame())
+    assert frame["RF_Prediction"].isna().sum() == np.isnan(cascaded.rf_predictions).sum()
+    assert frame["LR_Prediction"].dtype == np.int8
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+import fraud_inference
+from benchmarks.fraudWorkload import synthetic_batch
+from conftest import NUMERIC_CATEGORICAL
+from shared_code.fraudEngine import FraudEngine
+
+
+def write_split_input(path, columns, vocabularies, rows=3_000, na_rows=1_000):
+    # card4 has NaNs only in the first `na_rows` rows: read_csv would guess float there and int after
+    df = synthetic_batch(columns, vocabularies, rows, unknown_rate=0, nan_rate=0)
+    values = np.random.default_rng(1).integers(1, 4, rows).astype(float)
+    values[:na_rows:2] = np.nan
+    df[NUMERIC_CATEGORICAL] = pd.Series(values).astype("Int64")
+    df.to_csv(path, index=False)
+    return df
+
+
+def test_streaming_codes_match_in_memory(fraud_models, fraud_schema, tmp_path):
+    input_path = tmp_path / "input.csv"
+    df = write_split_input(input_path, *fraud_schema)
+    engine = FraudEngine(fraud_models)
+
+    fraud_inference.run_in_memory(engine, input_path, tmp_path / "memory.csv")
+    fraud_inference.run_streaming(engine, input_path, tmp_path / "streaming.csv", chunksize=1_000)
+
+    assert (tmp_path / "streaming.csv").read_bytes() == (tmp_path / "memory.csv").read_bytes()
+
+    # Whole numbers keep their class code, whichever chunk they are in
+    output = pd.read_csv(tmp_path / "streaming.csv")
+    table = engine.registry.current().encoding_tables[NUMERIC_CATEGORICAL]
+    known = df[NUMERIC_CATEGORICAL].notna().to_numpy()
+    expected = table.encode(df[NUMERIC_CATEGORICAL][known].astype(int))
+    assert (output[NUMERIC_CATEGORICAL].to_numpy()[known] == expected).all()
+    assert (expected != table.unknown_code).all()
+
+
+def test_parallel_shards_match_in_memory(fraud_models, fraud_schema, tmp_path):
+    # 2 workers cut 8 shards: only the first ones see card4 NaNs
+    input_path = tmp_path / "input.csv"
+    write_split_input(input_path, *fraud_schema)
+    engine = FraudEngine(fraud_models)
+
+    fraud_inference.run_in_memory(engine, input_path, tmp_path / "memory.csv")
+    fraud_inference.run_parallel(fraud_models, str(input_path), str(tmp_path / "parallel.csv"), workers=2, chunksize=1_000)
+
+    assert (tmp_path / "parallel.csv").read_bytes() == (tmp_path / "memory.csv").read_bytes()
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from benchmarks.fraudParity import reference_predict
+from benchmarks.fraudWorkload import synthetic_batch
+from shared_code.fraudEngine import FraudEngine
+
+'''
+The engine against the original pandas/sklearn pipeline of
+benchmarks/fraudParity.py, on a fixed sample with unknown categories and
+NaNs. The other entry points are checked by the script itself.
+'''
+
+
+@pytest.fixture(scope="module")
+def sample(fraud_schema):
+    return synthetic_batch(*fraud_schema, rows=500, unknown_rate=0.05, nan_rate=0.05, seed=7, first_id=2_987_000)
+
+
+@pytest.mark.parametrize("name, output", [("LR", 0), ("RF", 1), ("Meta", 3)])
+def test_engine_matches_reference_pipeline(fraud_models, sample, name, output):
+    expected = reference_predict(fraud_models, sample)
+    actual = FraudEngine(fraud_models).score(sample.copy()).as_tuple()
+    np.testing.assert_array_equal(actual[output], expected[output], err_msg=f"{name} predictions differ")
+
+
+def test_sample_has_both_labels(fraud_models, sample):
+    # Parity on constant predictions would prove little
+    lr, rf, _, meta = reference_predict(fraud_models, sample)
+    for predictions in (lr, rf, meta):
+        assert 0 < np.mean(predictions) < 1
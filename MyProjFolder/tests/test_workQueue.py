@@ -0,0 +1,139 @@
+import json
+import time
+
+import pandas as pd
+import pytest
+
+from shared_code.batchSizer import AdaptiveBatchSizer
+from shared_code.workQueue import WorkQueue
+
+
+class Backlog:
+    '''claim/process callbacks over `rows` unprocessed keys.'''
+
+    def __init__(self, rows):
+        self.keys = list(range(rows))
+        self.processed = []
+
+    def claim(self, conn, cursor, size):
+        batch, self.keys = self.keys[:size], self.keys[size:]
+        return "token", pd.DataFrame({"key": batch})
+
+    def process(self, conn, cursor, df, token):
+        self.processed.extend(df["key"])
+
+
+def test_drain_until_short_batch(tmp_path):
+    backlog = Backlog(250)
+    sizer = AdaptiveBatchSizer("Test", 100, min_size=10, state_dir=str(tmp_path))
+    stats = WorkQueue("Table", "key").drain(None, None, backlog.claim, backlog.process, sizer, time_budget_s=60)
+
+    assert stats["rows"] == 250 and not stats["budget_reached"]
+    assert backlog.processed == list(range(250))
+
+
+def test_drain_runs_first_batch_despite_slow_saved_rate(tmp_path):
+    # A rate saved by a run whose first batch included a slow model load
+    (tmp_path / "Test_batch_size.json").write_text(json.dumps({"size": 100, "rows_per_s": 0.01, "mib_per_row": 0.0}))
+    backlog = Backlog(50)
+    sizer = AdaptiveBatchSizer("Test", 100, min_size=10, state_dir=str(tmp_path))
+    assert sizer.next_size(60) == 0
+
+    stats = WorkQueue("Table", "key").drain(None, None, backlog.claim, backlog.process, sizer, time_budget_s=60)
+    assert stats["rows"] == 50 and stats["batches"] == 1
+
+
+def test_drain_does_not_time_prepare(tmp_path):
+    backlog = Backlog(100)
+    sizer = AdaptiveBatchSizer("Test", 100, min_size=10, state_dir=str(tmp_path))
+    WorkQueue("Table", "key").drain(None, None, backlog.claim, backlog.process, sizer, time_budget_s=60,
+                                    prepare=lambda: time.sleep(0.2))
+    assert sizer.rows_per_s > 100 / 0.2
+
+
+class ClaimCursor:
+    '''Answers the claim statement with `rows`; records every statement.'''
+
+    def __init__(self, rows):
+        self.description = [("PreviousClaimToken",), ("ClaimAttempts",), ("key",)]
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, sql, *params):
+        self.statements.append((" ".join(sql.split()), params))
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class Connection:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_claim_parks_rows_past_max_attempts():
+    queue = WorkQueue("Table", "key", max_attempts=3)
+    cursor = ClaimCursor([(None, 1, 1), ("old", 4, 2), ("old", 2, 3)])
+    conn = Connection()
+    token, df = queue.claim(conn, cursor, "inserted.[key]", 3)
+
+    assert df["key"].tolist() == [1, 3]
+    assert df.attrs["claimed_rows"] == 3 and df.attrs["retried_rows"] == 1
+    claim_sql, park_sql = (sql for sql, _ in cursor.statements)
+    assert "ClaimAttempts = ClaimAttempts + 1" in claim_sql
+    assert park_sql.startswith("UPDATE Table SET ClaimExpiresAt = ?")
+    assert cursor.statements[1][1] == ("9999-12-31", token, 3)
+    # Claim and park in one transaction
+    assert conn.commits == 1
+
+
+def test_claim_without_poison_rows_parks_nothing():
+    queue = WorkQueue("Table", "key", max_attempts=3)
+    cursor = ClaimCursor([(None, 1, 1), (None, 1, 2)])
+    _, df = queue.claim(Connection(), cursor, "inserted.[key]", 2)
+    assert df["key"].tolist() == [1, 2] and len(cursor.statements) == 1
+
+
+class RetriedBacklog(Backlog):
+    '''Every claimed batch holds rows of an earlier failed claim; `bad` keys always fail.'''
+
+    def __init__(self, rows, bad):
+        super().__init__(rows)
+        self.bad = set(bad)
+
+    def claim(self, conn, cursor, size):
+        token, df = super().claim(conn, cursor, size)
+        df.attrs["claimed_rows"] = len(df)
+        df.attrs["retried_rows"] = len(df)
+        return token, df
+
+    def process(self, conn, cursor, df, token):
+        if self.bad & set(df["key"]):
+            raise ValueError("bad row")
+        super().process(conn, cursor, df, token)
+
+
+def test_drain_isolates_failing_rows_of_retried_batch(tmp_path):
+    backlog = RetriedBacklog(100, bad=[17])
+    sizer = AdaptiveBatchSizer("Test", 100, min_size=10, state_dir=str(tmp_path))
+    stats = WorkQueue("Table", "key").drain(Connection(), None, backlog.claim, backlog.process, sizer, time_budget_s=60)
+
+    assert sorted(backlog.processed) == [key for key in range(100) if key != 17]
+    assert stats["rows"] == 99
+
+
+def test_drain_raises_when_every_part_fails(tmp_path):
+    backlog = RetriedBacklog(8, bad=range(8))
+    sizer = AdaptiveBatchSizer("Test", 100, min_size=1, state_dir=str(tmp_path))
+    # Every row failing is not a bad row (the database, the models), the error is raised
+    with pytest.raises(ValueError):
+        WorkQueue("Table", "key").drain(Connection(), None, backlog.claim, backlog.process, sizer, time_budget_s=60)
+    assert backlog.processed == []
@@ -17,20 +17,44 @@ conn = pyodbc.connect(
 cursor = conn.cursor()
 
 if len(sys.argv) < 2:
-    print("Please provide an argument: 'add' or 'drop'")
+    print("Please provide an argument: 'add', 'claims', 'attempts' or 'drop'")
     sys.exit(1)
 
 action = sys.argv[1].lower()  # get the first argument, lowercase for safety
 
+def add_attempts():
+    # Claims per row, rows claimed more than CLAIM_MAX_ATTEMPTS times are parked (shared_code/workQueue.py)
+    cursor.execute("ALTER TABLE ChurnTable ADD ClaimAttempts INT NOT NULL DEFAULT 0;")
+
+def add_claims():
+    # Claim token and lease of the work queue (shared_code/workQueue.py), so several trigger instances can run at once
+    cursor.execute("ALTER TABLE ChurnTable ADD ClaimToken UNIQUEIDENTIFIER NULL, ClaimExpiresAt DATETIME2 NULL;")
+    add_attempts()
+    # Filtered index on the unprocessed rows only: the claim finds them in key order without scanning processed ones
+    cursor.execute("CREATE INDEX IX_ChurnTable_Unprocessed ON ChurnTable (customer_id) INCLUDE (ClaimToken, ClaimExpiresAt) WHERE Processed = 0;")
+
 if action == "add":
     cursor.execute("ALTER TABLE ChurnTable ADD ChurnProbability FLOAT NOT NULL DEFAULT 0;")
     cursor.execute("ALTER TABLE ChurnTable ADD PredictedChurn INT NOT NULL DEFAULT 0;")
     cursor.execute("ALTER TABLE ChurnTable ADD Processed BIT NOT NULL DEFAULT 0;")
+    add_claims()
 
     conn.commit()
     print("Column 'Processed' added successfully!")
+if action == "claims":
+    # Tables migrated before the work queue: only the claim columns and the index
+    add_claims()
+    conn.commit()
+    print("Columns 'ClaimToken', 'ClaimExpiresAt', 'ClaimAttempts' and index 'IX_ChurnTable_Unprocessed' added successfully!")
+if action == "attempts":
+    # Tables that have the claim columns already: only the attempt counter
+    add_attempts()
+    conn.commit()
+    print("Column 'ClaimAttempts' added successfully!")
 if action == "drop":
-    for column_name in ['Processed', 'PredictedChurn', 'ChurnProbability']:
+    # The index filters on Processed, it has to go before the column
+    cursor.execute("DROP INDEX IF EXISTS IX_ChurnTable_Unprocessed ON ChurnTable;")
+    for column_name in ['Processed', 'PredictedChurn', 'ChurnProbability', 'ClaimToken', 'ClaimExpiresAt', 'ClaimAttempts']:
         cursor.execute(f"""
             DECLARE @ConstraintName NVARCHAR(200)
             SELECT @ConstraintName = dc.name
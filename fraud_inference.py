@@ -1,92 +1,212 @@
 import pandas as pd
-import numpy as np
-import joblib
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-
-# Load pre-trained objects
-scaler = joblib.load("scaler.pkl")
-label_encoders = joblib.load("label_encoder.pkl")
-X_train_columns = np.load("x_column_names.npy", allow_pickle=True).tolist()
-
-lr_model = joblib.load("lr_model.pkl")
-rf_model = joblib.load("rf_model.pkl")
-meta_model = joblib.load("meta_model.pkl")
-
-# Load test data
-X_test_df = pd.read_csv("x_test_inference.csv")
-
-# Save original TransactionID if exists
-transaction_ids = X_test_df["TransactionID"] if "TransactionID" in X_test_df.columns else pd.Series([f"Index_{i}" for i in range(len(X_test_df))])
-
-# Add missing columns
-for col in X_train_columns:
-    if col not in X_test_df.columns:
-        X_test_df[col] = 0
-
-# Drop unexpected columns
-extra_cols = [col for col in X_test_df.columns if col not in X_train_columns]
-if extra_cols:
-    print(f"[!] Dropping unexpected columns: {extra_cols}")
-    X_test_df.drop(columns=extra_cols, inplace=True)
-
-# Reorder columns to match training set
-X_test_df = X_test_df[X_train_columns]
-
-# Properly encode categorical columns
-for col in label_encoders:
-    if col in X_test_df.columns:
-        le = label_encoders[col]
-        test_vals = X_test_df[col].astype(str)
-        le_classes = list(le.classes_)
-        if 'unknown' not in le_classes:
-            le_classes.append('unknown')
-            le.classes_ = np.array(le_classes)
-        X_test_df[col] = test_vals.map(lambda x: x if x in le_classes else 'unknown')
-        X_test_df[col] = le.transform(X_test_df[col])
-
-# Check for missing expected columns
-missing_cols = set(X_train_columns) - set(X_test_df.columns)
-for col in missing_cols:
-    print(f"[!] Adding missing column: {col} (filled with 0s)")
-    X_test_df[col] = 0
-
-# Ensure the DataFrame has all expected columns in correct order
-X_test_df = X_test_df[X_train_columns]
-
-# Convert all to numeric
-X_test_df = X_test_df.apply(pd.to_numeric, errors='coerce')
-
-# Check for NaNs
-if X_test_df.isnull().any().any():
-    print("[!] Found NaN values after numeric conversion:")
-    print(X_test_df.isnull().sum()[X_test_df.isnull().sum() > 0])
-    X_test_df.fillna(0, inplace=True)
-
-# Scale features
-X_test_scaled = scaler.transform(X_test_df)
-
-# Predict
-lr_predictions = (lr_model.predict_proba(X_test_scaled)[:, 1] > 0.5).astype(int)
-rf_predictions = rf_model.predict(X_test_scaled)
-meta_input = np.column_stack([lr_predictions, rf_predictions])
-meta_predictions = (meta_model.predict(meta_input) < 0.3).astype(int)
-
-# Optional: check probability outputs
-print("\n[✓] Predictions completed successfully.")
-print(f"Logistic Regression Predictions: {lr_predictions[:10]}")
-print(f"Random Forest Predictions: {rf_predictions[:10]}")
-print(f"Meta Model Predictions: {meta_predictions[:10]}")
-# Save predictions
-X_test_df['LR_Prediction'] = lr_predictions
-X_test_df['RF_Prediction'] = rf_predictions
-X_test_df['Meta_Prediction'] = meta_predictions
-X_test_df['TransactionID'] = transaction_ids
-X_test_df.to_csv("predictions_output.csv", index=False)
-print("[✓] Predictions saved to predictions_output.csv.")
-
-# Print readable results
-print("\n[✓] Detailed Prediction Results:")
-for i in range(len(meta_predictions)):
-    tx_id = transaction_ids.iloc[i]
-    verdict = "YES" if meta_predictions[i] == 1 else "NO"
-    print(f"TransactionID: {tx_id} → Fraud: {verdict}")
\ No newline at end of file
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from threadpoolctl import threadpool_limits
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "MyProjFolder"))
+from shared_code.cascadeScoring import CascadeStats, cascade_from_env
+from shared_code.categoricalTables import csv_dtypes
+from shared_code.csvShards import byte_shards, count_lines, read_header, read_shard
+from shared_code.fraudEngine import FraudEngine, print_diagnostics
+from shared_code.modelRegistry import FRAUD_MODEL_FILES, load_artifacts
+from shared_code.predictionOutput import FORMATS, append_part, close_parts, open_writer
+
+'''
+Batch fraud scoring of a CSV file.
+
+    python fraud_inference.py                      # whole file in memory
+    python fraud_inference.py --chunksize 100000   # constant-memory streaming
+    python fraud_inference.py --workers 8          # byte-range shards on 8 processes
+    python fraud_inference.py --format parquet --ids-only --output predictions.parquet
+
+Streaming reads the input in fixed-size chunks, runs the same encoding,
+alignment and scaling per chunk against the models loaded once at start-up
+and appends each scored chunk to the output, so peak memory depends on the
+chunk size and not on the file size. The label-encoded columns are read
+as text in every mode, so their codes do not depend on what else is in a
+chunk.
+
+With --workers N the data lines are cut into byte-range shards that N
+processes score in parallel (models loaded once per worker, one BLAS thread
+each); the per-shard parts are concatenated in input order.
+'''
+
+
+def run_in_memory(engine, input_path, output_path, fmt="csv", ids_only=False):
+    # Load test data
+    X_test_df = pd.read_csv(input_path, dtype=engine.csv_dtypes())
+    result = engine.score(X_test_df)
+    print_diagnostics(result)
+    output_df = result.to_frame()
+
+    lr_predictions = output_df['LR_Prediction'].to_numpy()
+    rf_predictions = output_df['RF_Prediction'].to_numpy()
+    meta_predictions = output_df['Meta_Prediction'].to_numpy()
+    transaction_ids = output_df['TransactionID']
+
+    # Optional: check probability outputs
+    print("\n[✓] Predictions completed successfully.")
+    print(f"Logistic Regression Predictions: {lr_predictions[:10]}")
+    print(f"Random Forest Predictions: {rf_predictions[:10]}")
+    print(f"Meta Model Predictions: {meta_predictions[:10]}")
+    writer = open_writer(output_path, fmt, ids_only)
+    writer.write(output_df)
+    writer.close()
+    print(f"[✓] Predictions saved to {output_path}.")
+
+    # Print readable results
+    print("\n[✓] Detailed Prediction Results:")
+    for i in range(len(meta_predictions)):
+        tx_id = transaction_ids.iloc[i]
+        verdict = "YES" if meta_predictions[i] == 1 else "NO"
+        print(f"TransactionID: {tx_id} → Fraud: {verdict}")
+    print_cascade(cascade_snapshot(engine))
+
+
+def print_cascade(snapshot):
+    if snapshot is None:
+        return
+    skipped = snapshot["skipped_low"] + snapshot["skipped_high"]
+    print(f"[✓] Cascade: {skipped:,} of {snapshot['rows']:,} rows decided by LR alone ({snapshot['skipped_fraction']:.1%}; "
+          f"{snapshot['skipped_low']:,} below, {snapshot['skipped_high']:,} above the band), "
+          f"{snapshot['full']:,} through the full ensemble.")
+
+
+def cascade_snapshot(engine):
+    return engine.cascade.stats.snapshot() if engine.cascade is not None else None
+
+
+def print_summary(stats, output_path, elapsed, cascade=None):
+    if stats["extra_columns"]:
+        print(f"[!] Dropped unexpected columns: {stats['extra_columns']}")
+    if stats["nan_counts"]:
+        print("[!] NaN values filled with 0 after numeric conversion:")
+        print(pd.Series(stats["nan_counts"]))
+
+    rows = stats["rows"]
+    print(f"\n[✓] {rows:,} predictions saved to {output_path} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s).")
+    print(f"[✓] Fraud: {stats['frauds']:,} of {rows:,} transactions.")
+    print_cascade(cascade)
+
+
+def run_streaming(engine, input_path, output_path, chunksize, fmt="csv", ids_only=False):
+    start = time.perf_counter()
+
+    def progress(stats):
+        elapsed = time.perf_counter() - start
+        print(f"[…] {stats['rows']:,} rows scored, {stats['frauds']:,} flagged, {stats['rows'] / elapsed:,.0f} rows/s")
+
+    writer = open_writer(output_path, fmt, ids_only)
+    try:
+        stats = engine.score_to(pd.read_csv(input_path, chunksize=chunksize, dtype=engine.csv_dtypes()), writer, progress=progress)
+    finally:
+        writer.close()
+    print_summary(stats, output_path, time.perf_counter() - start, cascade_snapshot(engine))
+
+
+_worker_engine = None
+
+
+def _init_worker(models_dir):
+    # One BLAS/OpenMP thread per worker process, the processes are the parallelism
+    threadpool_limits(1)
+    global _worker_engine
+    _worker_engine = FraudEngine(models_dir, cascade_from_env())
+    _worker_engine.registry.current()
+
+
+def _score_shard(task):
+    chunks = read_shard(task["input"], task["start"], task["end"], task["columns"], task["chunksize"], task["dtype"])
+    writer = open_writer(task["part"], task["format"], task["ids_only"], header=task["index"] == 0)
+    before = cascade_snapshot(_worker_engine)
+    try:
+        stats = _worker_engine.score_to(chunks, writer, first_index=task["first_index"])
+    finally:
+        writer.close()
+    # A worker's cascade counts run over all its shards, report what this shard added
+    if before is not None:
+        after = cascade_snapshot(_worker_engine)
+        stats["cascade"] = {path: after[path] - before[path] for path in ("skipped_low", "skipped_high", "full")}
+    return stats
+
+
+def run_parallel(models_dir, input_path, output_path, workers, chunksize, fmt="csv", ids_only=False):
+    start = time.perf_counter()
+    columns, _ = read_header(input_path)
+    # One dtype map for every shard, from the label encoders alone (the workers load the full set)
+    label_encoders = load_artifacts(models_dir, {"label_encoders": FRAUD_MODEL_FILES["label_encoders"]}, "Fraud")["label_encoders"]
+    dtype = csv_dtypes(label_encoders)
+    # A few shards per worker keeps the pool balanced and the progress readout moving
+    shards = byte_shards(input_path, workers * 4)
+
+    # Generated Index_<n> ids need each shard's first global row number
+    first_indexes = [0] * len(shards)
+    if "TransactionID" not in columns:
+        total = 0
+        for i, (shard_start, shard_end) in enumerate(shards):
+            first_indexes[i] = total
+            total += count_lines(input_path, shard_start, shard_end)
+
+    stats = {"rows": 0, "frauds": 0, "extra_columns": None, "nan_counts": {}}
+    cascade = None
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as parts_dir:
+        tasks = [
+            {
+                "index": i, "input": input_path, "start": shard_start, "end": shard_end,
+                "columns": columns, "dtype": dtype, "chunksize": chunksize, "first_index": first_indexes[i],
+                "format": fmt, "ids_only": ids_only, "part": os.path.join(parts_dir, f"part-{i:05d}.{fmt}"),
+            }
+            for i, (shard_start, shard_end) in enumerate(shards)
+        ]
+
+        merged = {}
+        with multiprocessing.Pool(workers, _init_worker, (models_dir,)) as pool:
+            # imap keeps shard order, each finished part is appended as soon as its predecessors are
+            for task, shard_stats in zip(tasks, pool.imap(_score_shard, tasks)):
+                append_part(task["part"], output_path, fmt, merged)
+                os.remove(task["part"])
+
+                if stats["extra_columns"] is None:
+                    stats["extra_columns"] = shard_stats["extra_columns"]
+                for col, count in shard_stats["nan_counts"].items():
+                    stats["nan_counts"][col] = stats["nan_counts"].get(col, 0) + count
+                stats["rows"] += shard_stats["rows"]
+                stats["frauds"] += shard_stats["frauds"]
+                if "cascade" in shard_stats:
+                    cascade = cascade or CascadeStats()
+                    cascade.record(**shard_stats["cascade"])
+
+                elapsed = time.perf_counter() - start
+                print(f"[…] shard {task['index'] + 1}/{len(tasks)}: {stats['rows']:,} rows scored, {stats['rows'] / elapsed:,.0f} rows/s")
+        close_parts(output_path, fmt, merged)
+
+    print_summary(stats, output_path, time.perf_counter() - start, cascade.snapshot() if cascade is not None else None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV of transactions with the fraud models")
+    parser.add_argument("--input", default="x_test_inference.csv")
+    parser.add_argument("--output", default="predictions_output.csv")
+    parser.add_argument("--models", default=os.getenv("FRAUD_MODEL_DIR", "."), help="directory with the model artifacts")
+    parser.add_argument("--chunksize", type=int, help="stream the input in chunks of this many rows")
+    parser.add_argument("--workers", type=int, default=1, help="score byte-range shards in this many processes")
+    parser.add_argument("--format", choices=FORMATS, default="csv", help="output format")
+    parser.add_argument("--ids-only", action="store_true", help="write only TransactionID and the predictions")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_parallel(args.models, args.input, args.output, args.workers, args.chunksize or 100_000, args.format, args.ids_only)
+        sys.exit(0)
+
+    # Load pre-trained objects once
+    engine = FraudEngine(args.models, cascade_from_env())
+    engine.registry.current()
+
+    if args.chunksize:
+        run_streaming(engine, args.input, args.output, args.chunksize, args.format, args.ids_only)
+    else:
+        run_in_memory(engine, args.input, args.output, args.format, args.ids_only)